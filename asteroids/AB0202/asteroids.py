@@ -4,38 +4,84 @@ Credits:
  * Sprites: 
  * Sound: 
 """
+import argparse
 import os
-from math import copysign, cos, radians, sin
-from random import randint
-from typing import Any, Dict, Tuple
+from math import ceil, hypot, radians
+from random import Random
+from typing import Dict, Iterable, Optional, Tuple
 
 import pygame
-from pygame.constants import (K_ESCAPE, K_LEFT, K_RIGHT, K_UP, KEYDOWN, KEYUP,
-                              QUIT)
+from pygame.constants import (K_ESCAPE, K_F3, K_LEFT, K_RIGHT, K_SPACE, K_UP,
+                              KEYDOWN, KEYUP, QUIT, VIDEORESIZE)
 
-from mytools import SpriteContainer, Timer
+from collision import SpatialHash
+from ecs import World
+from fixedpoint import ONE, to_fixed, to_fixed_array, to_float
+from mytools import AssetManager, Scheduler, SimulationClock, SpriteContainer, Timer
+from particles import ParticleSystem
+from profiler import FrameProfiler
+from replay import InputLog, ReplayPlayer
+from renderqueue import RenderQueue
+from rendertarget import RenderTarget
+from spawner import OccupancyGrid
+from torus import Torus
+from trig import AngleTable
+
+KIND_SHIP, KIND_ROCK, KIND_BULLET = 0, 1, 2  # types of the entities in Game.world
 
 
 class Settings:
     """Project global informations"""
 
-    window = {"width": 1200, "height": 700}
+    window = {"width": 1200, "height": 700}  # logical resolution: the game is drawn in this size and scaled to the display
+    display: Optional[Tuple[int, int]] = None  # size of the window; None = the logical size
+    fullscreen = False  # True = the window covers the whole display
+    integer_coverage = 0.9  # whole scale factors are used if the frame keeps this share of its possible size; 0 = always
     fps = 60
+    timestep = 1000 / fps  # length of one simulation step in milli seconds
+    max_steps = 5  # upper bound of simulation steps per rendered frame
     path: Dict[str, str] = {}
     path["file"] = os.path.dirname(os.path.abspath(__file__))
     path["image"] = os.path.join(path["file"], "images")
     path["sound"] = os.path.join(path["file"], "sounds")
     caption = 'Fingerübung "Asteroids"'
     playground = pygame.Rect(0, 0, window["width"], window["height"] - 50)
+    torus = Torus(playground)  # wraparound of the playground for drawing and collisions
     d_angle = 22.5
+    headings = AngleTable(round(360 / d_angle))  # one entry per ship heading = sprite frame
+    rock_angles = AngleTable(360)  # one entry per degree for the directions of rocks
     max_big_rocks = 5
     rock_intervall = 300
+    rock_tiers = {  # size: speed, first and last index in the sprite sequence "rocks"
+        "big": (-3.0, 0, 0),
+        "medium": (-4, 1, 2),
+        "small": (-4, 3, 5),
+        "tiny": (-5, 6, 9),
+    }
+    rock_fragments = {"big": "medium", "medium": "small", "small": "tiny"}  # size of the fragments of a hit rock
+    fragment_count = 2
+    fragment_inheritance = 0.5  # part of the velocity of the rock inherited by its fragments
+    rock_pool = {"big": 8, "medium": 16, "small": 32, "tiny": 64}
+    lifes = 3
+    cell_size = 64  # cell size of the spatial hash and the spawn grid; at least the size of the biggest sprite
+    spawn_safe_radius = 150  # new rocks keep this distance in pixel from the ships
+    bullet_index = 0  # sprite index in the sprite sequence "bullets"
+    bullet_speed = 10
+    bullet_lifetime = 1000  # milli seconds
+    bullet_range = 600  # pixel
+    bullet_intervall = 150  # milli seconds between two shots while firing
+    max_bullets = 32
+    dirty_rendering = True  # True = only changed areas of the screen are redrawn and updated
+    layers = {"rocks": 0, "bullets": 1, "ships": 2}  # drawing order of the render queue
+    particle_capacity = 65536  # maximum number of live particles; the oldest are overwritten
+    exhaust_particles = 6  # particles per step while the ship accelerates
+    explosion_particles = {"big": 800, "medium": 400, "small": 200, "tiny": 80}  # debris of a destroyed rock
 
     @staticmethod
     def get_dim() -> Tuple[int, int]:
-        """Dimensions of the screen.
+        """Logical dimensions of the screen; the window may have another size (see RenderTarget).
         Returns:
-            (int, int): Width and height of the window.
+            (int, int): Width and height of the logical screen.
         """
         return (Settings.window["width"], Settings.window["height"])
 
@@ -79,208 +125,374 @@ class Settings:
 
 
 class Background(pygame.sprite.Sprite):
-    """Sprite class with nearly no function for drawing the background image."""
+    """Sprite class with nearly no function for drawing the background image.
+
+    The image is loaded and scaled in the background; until it is ready the previous
+    background (or a black placeholder) is shown. It is scaled once to the logical resolution,
+    so a change of the window size does not load it again.
+    """
 
-    def __init__(self, filename: str = "background.png") -> None:
+    def __init__(self, assets: AssetManager, filename: str = "background.png") -> None:
         """Constructor.
 
         Args:
+            assets (AssetManager): Loads and scales the image.
             filename (str, optional): Filename of the background image. Defaults to "background.png".
         """
         super().__init__()
-        self.image = pygame.image.load(Settings.get_image(filename)).convert()
-        self.image = pygame.transform.scale(self.image, Settings.get_dim())
+        self._assets = assets
+        self.image = pygame.Surface(Settings.get_dim())
         self.rect = self.image.get_rect()
+        self.set_image(filename)
+
+    def set_image(self, filename: str) -> None:
+        """Switches to another background image as soon as it is loaded.
+
+        Args:
+            filename (str): Filename of the background image.
+        """
+        self._filename = filename
+        self._assets.request(filename, size=Settings.get_dim(), alpha=False)
+
+    def refresh(self) -> bool:
+        """Takes the requested image if it is ready.
+
+        Returns:
+            bool: True = the image has changed and the whole screen has to be redrawn
+        """
+        image = self._assets.get(self._filename, size=Settings.get_dim(), alpha=False, placeholder=self.image)
+        if image is self.image:
+            return False
+        self.image = image
+        return True
 
 class Bullet(pygame.sprite.Sprite):
-    __sound_fire = None
-    def __init__(self, tank):
+    """Bullet sprite class; a view of a bullet entity of Game.world while it is flying.
+
+    Bullets are not created while playing; they are taken from and given back to a BulletPool.
+    """
+
+    def __init__(self) -> None:
+        """Constructor"""
         super().__init__()
-        number  = {'left':49, 'right':61, 'up':37, 'down':73}
-        fullfilename = os.path.join(Settings.path['image'], f"tankbrigade_part{number[tank.direction]}.png")
-        self.image = pygame.image.load(fullfilename).convert()
-        self.image.set_colorkey((0, 0, 0))
-        self.rect = self.image.get_rect()
-        self.direction = tank.direction
-        self.bulletspeed = 10
-        self.speed = (0, 0)
-        self.rect.center = tank.rect.center
-        if tank.direction == 'left':
-            self.speed = (-self.bulletspeed, 0)
-            self.rect.right = tank.rect.left
-        elif tank.direction == 'right':
-            self.speed = (self.bulletspeed, 0)
-            self.rect.left = tank.rect.right
-        elif tank.direction == 'up':
-            self.speed = (0, -self.bulletspeed)
-            self.rect.bottom = tank.rect.top
-        elif tank.direction == 'down':
-            self.speed = (0, self.bulletspeed)
-            self.rect.top = tank.rect.bottom
+        frame = Game.Sprite_container.get_frames("bullets")[Settings.bullet_index]
+        self.image = frame.image
+        self.mask = frame.mask
+        self.rect: pygame.rect.Rect = self.image.get_rect()
+        self.world: Optional[World] = None  # world of the firing ship; set by World.spawn
+        self.entity = -1  # slot in the world; -1 = not flying
+
+    def fire(self, ship: "Ship") -> None:
+        """Starts the bullet at the center of the ship in the direction of the ship, in the world of the ship.
 
+        The bullet expires when it has exhausted its lifetime or has flown its range at its
+        actual speed, which includes the speed of the ship.
+
+        Args:
+            ship (Ship): the firing ship
+        """
+        muzzle_x, muzzle_y = Settings.headings.fixed(ship.imageindex, Settings.bullet_speed)
+        speed_x, speed_y = ship.fixed_speed
+        self.rect.center = ship.rect.center
+        position = (to_fixed(self.rect.left), to_fixed(self.rect.top))
+        velocity = (speed_x - muzzle_x, speed_y - muzzle_y)
+        lifetime = int(Settings.bullet_lifetime / Settings.timestep)
+        speed = hypot(*velocity)
+        if speed > 0:
+            lifetime = min(lifetime, ceil(Settings.bullet_range * ONE / speed))
+        ship.world.spawn(KIND_BULLET, position, velocity, self.rect.size, Settings.bullet_index, lifetime, sprite=self)
+
+    def kill(self) -> None:
+        """Removes the bullet from all groups and from the world."""
+        if self.entity >= 0:
+            self.world.despawn(self.entity)
+            self.entity = -1
+        super().kill()
+
+
+class BulletPool:
+    """Fixed number of preallocated bullets which are reused."""
+
+    def __init__(self, capacity: int) -> None:
+        """Constructor
+
+        Args:
+            capacity (int): maximum number of bullets flying at the same time
+        """
+        self._free = [Bullet() for _ in range(capacity)]
+        self.active = pygame.sprite.Group()
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def reserve(self, capacity: int) -> None:
+        """Adds bullets until the pool holds at least capacity bullets, e.g. for more ships.
+
+        Args:
+            capacity (int): maximum number of bullets flying at the same time
+        """
+        missing = capacity - len(self._free) - len(self.active)
+        self._free.extend(Bullet() for _ in range(missing))
+
+    def fire(self, ship: "Ship", *groups: pygame.sprite.AbstractGroup) -> Bullet | None:
+        """Takes a free bullet and fires it.
+
+        Args:
+            ship (Ship): the firing ship
+            groups (pygame.sprite.AbstractGroup): additional groups of the bullet, e.g. for drawing
+
+        Returns:
+            Bullet | None: the fired bullet; None if all bullets are flying
+        """
+        if not self._free:
+            return None
+        bullet = self._free.pop()
+        bullet.fire(ship)
+        bullet.add(self.active, *groups)
+        return bullet
+
+    def release(self, bullet: Bullet) -> None:
+        """Removes a bullet from all groups and gives it back to the pool.
+
+        Args:
+            bullet (Bullet): flying bullet
+        """
+        if bullet.alive():
+            bullet.kill()
+            self._free.append(bullet)
 
 
 class Ship(pygame.sprite.Sprite):
-    """Ship sprite class."""
+    """Ship sprite class; a view of a ship entity of Game.world."""
 
-    def __init__(self) -> None:
-        """Constructor"""
+    def __init__(self, world: World, scheduler: Scheduler = None) -> None:
+        """Constructor; adds the ship to a world.
+
+        Args:
+            world (World): entity-component store of the game
+            scheduler (Scheduler, optional): Scheduler which triggers the timers of the ship. Defaults to None which means polling Timers.
+        """
         super().__init__()
         self._mode = 0  # 0 = flying, 1 = accelerating
-        self.images = Game.Sprite_container.get_sprites("ships_flying")
-        self.imageindex = 0
-        self.image: pygame.surface.Surface = self.images[self.imageindex]
-        self.mask = pygame.mask.from_surface(self.image)
+        self._frames = (
+            Game.Sprite_container.get_frames("ships_flying"),
+            Game.Sprite_container.get_frames("ships_acc"),
+        )
+        self.imageindex = 0  # heading: index in Settings.headings and in the sprite sequences
+        self.image: pygame.surface.Surface
+        self.mask: pygame.mask.Mask
+        self.rect: pygame.rect.Rect = self._frames[0][0].image.get_rect()
+        self.world = world
+        self.entity = -1  # slot in the world; -1 = not part of the world
+        self._timer_acc = scheduler.timer(100) if scheduler is not None else Timer(100)
+        anchor = (self.rect.width // 2, self.rect.height // 2)  # the position of the entity is the center of the ship
+        world.spawn(KIND_SHIP, (0, 0), size=self.rect.size, anchor=anchor, sprite=self)
+        self._set_frame()
+        self.respawn()
+
+    @property
+    def fixed_speed(self) -> list[int]:
+        """Speed in x and y direction in sub-pixels per step."""
+        return self.world.velocities[self.entity].tolist()
+
+    @property
+    def speed_x(self) -> float:
+        """Speed in x direction in pixels per step."""
+        return to_float(int(self.world.velocities[self.entity, 0]))
+
+    @property
+    def speed_y(self) -> float:
+        """Speed in y direction in pixels per step."""
+        return to_float(int(self.world.velocities[self.entity, 1]))
+
+    @property
+    def accelerating(self) -> bool:
+        """True = the thrust is on."""
+        return self._mode == 1
+
+    def respawn(self, center: Optional[Tuple[int, int]] = None) -> None:
+        """Places the ship motionless at a point.
 
-        self.rect: pygame.rect.Rect = self.image.get_rect()
-        self.rect.center = Settings.playground.center
-        self._timer_acc = Timer(100)
-        self._angle = 0
-        self.speed_x = 0
-        self.speed_y = 0
+        Args:
+            center (Tuple[int, int], optional): new center of the ship; None = the center of the playground. Defaults to None.
+        """
+        self.rect.center = center if center is not None else Settings.playground.center
+        self.world.place(self.entity, (to_fixed(self.rect.centerx), to_fixed(self.rect.centery)))
+        self.world.velocities[self.entity] = 0
+
+    def kill(self) -> None:
+        """Removes the ship from all groups and from the world."""
+        if self.entity >= 0:
+            self.world.despawn(self.entity)
+            self.entity = -1
+        super().kill()
 
     def get_angle(self) -> float:
-        """Converts the angle from grad to radiant.
+        """Converts the heading into an angle.
 
         Returns:
             float: radiant of the angle
         """
-        return radians(self._angle)
+        return radians(self.imageindex * Settings.headings.step_angle)
+
+    def _set_frame(self) -> None:
+        """Takes image and mask of the current mode and angle from the precomputed frames."""
+        frame = self._frames[self._mode][self.imageindex]
+        self.image = frame.image
+        self.mask = frame.mask
+        if self.entity >= 0:
+            self.world.frames[self.entity] = self.imageindex
 
-    def _set_mode(self, mode: int) -> None:
+    def set_mode(self, mode: int) -> None:
         """Determines whether the ship is flying or accelerating.
 
         Args:
             mode (int): 0 = flying, 1 = accelerating
         """
-        self._mode = mode
-        if mode == 0:
-            self.images = Game.Sprite_container.get_sprites("ships_flying")
-        elif mode == 1:
-            self.images = Game.Sprite_container.get_sprites("ships_acc")
+        if mode in (0, 1):
+            self._mode = mode
+            self._set_frame()
 
-    def _rotate(self, direction: int) -> None:
-        """Shifts the angle of the ship.
+    def rotate(self, direction: int) -> None:
+        """Shifts the heading of the ship by steps of Settings.d_angle.
 
-        Sets the new angle, changes the image, and creates the new mask.
+        Sets the new heading and takes image and mask from the precomputed frames.
 
         Args:
             direction (int): -1 = rotate left, +1 rotate right
         """
-        self._angle += copysign(Settings.d_angle, direction)
-        self._angle %= 360
         self.imageindex += direction
-        self.imageindex %= len(self.images)
-        self.image = self.images[self.imageindex]
-        self.mask = pygame.mask.from_surface(self.image)
+        self.imageindex %= len(Settings.headings)
+        self._set_frame()
 
-    def update(self, *args: Any, **kwargs: Any) -> None:
-        """Main update function of the sprite.
+    def accelerate(self) -> None:
+        """Speeds the ship up in the direction of its heading while it is accelerating.
 
-        The method controls which behaviour of the sprite changes:
-
-        Args:
-            direction (int): -1 = rotate left, +1 rotate right
-            mode (int): 0 = flying, 1 = accelerating
-            go (bool): True = update of speed and position
-        """
-        if "direction" in kwargs.keys():
-            self._rotate(kwargs["direction"])
-        if "mode" in kwargs.keys():
-            self._set_mode(kwargs["mode"])
-        if "go" in kwargs.keys():
-            if kwargs["go"]:
-                self.image = self.images[self.imageindex]
-                if self._mode == 1:
-                    if self._timer_acc.is_next_stop_reached():  # Beschleunigung verlangsamen
-                        angle = radians(self._angle)
-                        newspeed_x = self.speed_x - sin(angle)  # Geschwindigkeit begrenzen
-                        newspeed_y = self.speed_y - cos(angle)
-                        if abs(newspeed_x) < 10 and abs(newspeed_y) < 10:
-                            self.speed_x = newspeed_x
-                            self.speed_y = newspeed_y
-                self.rect.move_ip(self.speed_x, self.speed_y)
-                if self.rect.right < 0:
-                    self.rect.left = Settings.playground.width
-                if self.rect.left > Settings.playground.width:
-                    self.rect.right = 0
-                if self.rect.bottom < 0:
-                    self.rect.top = Settings.playground.height
-                if self.rect.top > Settings.playground.height:
-                    self.rect.bottom = 0
-
-    def draw(self, surface: pygame.surface.Surface) -> None:
-        """Blits the image on the surface.
-
-        Args:
-            surface (pygame.surface.Surface): Target of the blit operation.
-        """
-        surface.blit(self.image, self.rect)
+        The thrust is applied every 100 ms; the speed stays below 10 pixels per step. The
+        movement itself is done by World.move.
+        """
+        if self._mode == 1 and self._timer_acc.is_next_stop_reached():  # Beschleunigung verlangsamen
+            speed = self.world.velocities[self.entity]
+            thrust_x, thrust_y = Settings.headings.fixed(self.imageindex)
+            newspeed_x = int(speed[0]) - thrust_x  # Geschwindigkeit begrenzen
+            newspeed_y = int(speed[1]) - thrust_y
+            if abs(newspeed_x) < 10 * ONE and abs(newspeed_y) < 10 * ONE:
+                speed[:] = newspeed_x, newspeed_y
 
 
 class Rock(pygame.sprite.Sprite):
-    """Rock sprite class"""
+    """Rock sprite class; a view of a rock entity of Game.world while it is in the game."""
 
-    def __init__(self, size : str ="big") -> None:
+    def __init__(self, size : str ="big", rng: Random = None) -> None:
         """Constructor 
 
         Args:
             size (str, optional): defines the size of the rock. Possible are "big", "medium", "small", and "large". Defaults to "big".
+            rng (Random, optional): random number generator for sprite, angle and position. Defaults to None which means an unseeded generator.
         """
         super().__init__()
-        self.speed = 0
-        if size == "big":
-            self.speed = -3.0
-            index = 0
-        elif size == "medium":
-            index = randint(1, 2)
-            self.speed = -4
-        elif size == "small":
-            index = randint(3, 5)
-            self.speed = -4
-        elif size == "tiny":
+        self._rng = rng if rng is not None else Random()
+        self.world: Optional[World] = None  # set by World.spawn
+        self.entity = -1  # slot in the world; -1 = not part of the world
+        self.rect: pygame.rect.Rect = pygame.Rect(0, 0, 0, 0)
+        self.reset(size)
+
+    def reset(self, size: str = "big") -> None:
+        """(Re)initializes the rock with a random sprite of its size, a random direction and a random position.
+
+        Rocks are reused by the RockPool; this method does not create any sprite or surface.
+
+        Args:
+            size (str, optional): defines the size of the rock; see Settings.rock_tiers. Defaults to "big".
+        """
+        self.size = size
+        self.speed, first, last = Settings.rock_tiers.get(size, (0, 0, 0))
+        index = first if first == last else self._rng.randint(first, last)
+        if size == "tiny":
             self._points = 20
-            self.speed = -5
-            index = randint(6, 9)
-        else:
-            index = 0
-        self.image = Game.Sprite_container.get_sprites("rocks")[index]
-        self.rect: pygame.rect.Rect = self.image.get_rect()
-        self.mask = pygame.mask.from_surface(self.image)
-        self._angle = randint(0, 360)
-        angle = radians(self._angle)
-        self.speed_x = self.speed * sin(angle)
-        self.speed_y = self.speed * cos(angle)
+        self.index = index
+        frame = Game.Sprite_container.get_frames("rocks")[index]
+        self.image = frame.image
+        self.rect.size = self.image.get_size()
+        self.mask = frame.mask
+        self._angle = self._rng.randint(0, 360)
+        sine, cosine = Settings.rock_angles.vector(self._angle)
+        self.speed_x = self.speed * sine
+        self.speed_y = self.speed * cosine
         self.newpos()
 
     def newpos(self) -> None:
         """Defines a new ramdom position"""
-        self.rect.left = randint(self.rect.width + 5, Settings.playground.width - self.rect.width - 5)
-        self.rect.top = randint(self.rect.height + 5, Settings.playground.height - self.rect.height - 5)
+        self.rect.left = self._rng.randint(self.rect.width + 5, Settings.playground.width - self.rect.width - 5)
+        self.rect.top = self._rng.randint(self.rect.height + 5, Settings.playground.height - self.rect.height - 5)
+        if self.entity >= 0:
+            self.world.place(self.entity, (to_fixed(self.rect.left), to_fixed(self.rect.top)))
+
+    def kill(self) -> None:
+        """Removes the rock from all groups and from the world."""
+        if self.entity >= 0:
+            self.world.despawn(self.entity)
+            self.entity = -1
+        super().kill()
+
+
+class RockPool:
+    """Preallocated rocks of every size which are reused after being destroyed.
 
-    def update(self, *args: Any, **kwargs: Any) -> None:
-        """Main update function of the sprite.
+    During the game no rock sprite is created; if all rocks of a size are in use, no further
+    rock of this size appears until one is released.
+    """
 
-        The method controls which behaviour of the sprite changes:
+    def __init__(self, capacities: Dict[str, int], rng: Random) -> None:
+        """Constructor
 
         Args:
-            actiobn (str): 
-             # "go": computes the new position
-             # "newpos": defines a new randomly choosen position 
+            capacities (Dict[str, int]): number of preallocated rocks per size
+            rng (Random): random number generator shared by all rocks
         """
-        if "action" in kwargs.keys():
-            if kwargs["action"] == "go":
-                self.rect.move_ip(self.speed_x, self.speed_y)
-                if self.rect.right < 0:
-                    self.rect.left = Settings.playground.width
-                if self.rect.left > Settings.playground.width:
-                    self.rect.right = 0
-                if self.rect.bottom < 0:
-                    self.rect.top = Settings.playground.height
-                if self.rect.top > Settings.playground.height:
-                    self.rect.bottom = 0
-            if kwargs["action"] == "newpos":
-                self.newpos()
+        self._free: Dict[str, list[Rock]] = {size: [Rock(size, rng) for _ in range(count)] for size, count in capacities.items()}
+        self._in_use: Dict[str, int] = {size: 0 for size in capacities}
+
+    def in_use(self, size: str) -> int:
+        """Number of rocks of a size which are currently in the game.
+
+        Args:
+            size (str): size of the rocks
+
+        Returns:
+            int: number of acquired and not yet released rocks
+        """
+        return self._in_use.get(size, 0)
+
+    def acquire(self, size: str) -> Optional[Rock]:
+        """Takes a free rock and reinitializes it.
+
+        Args:
+            size (str): size of the rock
+
+        Returns:
+            Optional[Rock]: the rock; None if all rocks of this size are in use
+        """
+        free = self._free.get(size)
+        if not free:
+            return None
+        rock = free.pop()
+        rock.reset(size)
+        self._in_use[size] += 1
+        return rock
+
+    def release(self, rock: Rock) -> None:
+        """Removes a rock from the game and gives it back to the pool.
+
+        Rocks which have not been created by the pool are adopted.
+
+        Args:
+            rock (Rock): rock in the game
+        """
+        rock.kill()
+        self._free.setdefault(rock.size, []).append(rock)
+        if self._in_use.get(rock.size, 0) > 0:
+            self._in_use[rock.size] -= 1
 
 
 class Game:
@@ -288,75 +500,498 @@ class Game:
 
     Sprite_container: SpriteContainer
 
-    def __init__(self) -> None:
-        """Constructor"""
+    def __init__(
+        self,
+        headless: bool = False,
+        seed: Optional[int] = None,
+        clock: Optional[SimulationClock] = None,
+        input_log: Optional[InputLog] = None,
+        profiler: Optional[FrameProfiler] = None,
+        sprites: Optional[SpriteContainer] = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            headless (bool, optional): True = the game runs without a visible window and is
+                simulated as fast as possible; nothing is drawn. Defaults to False.
+            seed (int, optional): Seed of the random number generator; None = random seed. Defaults to None.
+            clock (SimulationClock, optional): Simulation time of the game; None = a new clock starting at 0. Defaults to None.
+            input_log (InputLog, optional): Log which records all handled input events. Defaults to None.
+            profiler (FrameProfiler, optional): Collects the timings of the frames; None = a disabled profiler which can be switched on with F3. Defaults to None.
+            sprites (SpriteContainer, optional): Sprites shared by several games of a process; None = the sprites are loaded. Defaults to None.
+        """
+        self._headless = headless
+        self.seed = seed if seed is not None else Random().randrange(2**63)
+        self._random = Random(self.seed)
+        self._scheduler = Scheduler(clock)
+        self._input_log = input_log
+        self.frame = 0  # number of simulated steps
+        self.profiler = profiler if profiler is not None else FrameProfiler(enabled=False)
+        self._overlay_rect: Optional[pygame.Rect] = None
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
         pygame.init()
-        self._screen = pygame.display.set_mode(Settings.get_dim())
+        if headless:
+            self._target = RenderTarget(Settings.get_dim())
+        else:
+            flags = pygame.RESIZABLE | (pygame.FULLSCREEN if Settings.fullscreen else 0)
+            display = Settings.display if Settings.display is not None else ((0, 0) if Settings.fullscreen else None)
+            self._target = RenderTarget(Settings.get_dim(), display, flags, Settings.integer_coverage)
+        self._screen = self._target.surface
         pygame.display.set_caption(Settings.caption)
         self._clock = pygame.time.Clock()
 
-        Game.Sprite_container = SpriteContainer(
-            Settings.get_file("sprites.json"), Settings.get_image("spritesheet.bmp"), (0, 0, 0)
-        )
-        self._background = pygame.sprite.GroupSingle(Background("background_black.png"))
-        self._ship = Ship()
+        Game.Sprite_container = sprites if sprites is not None else Game.load_sprites(headless=headless)
+        if not headless:
+            self._assets = AssetManager(Settings.path["image"])
+            self._background = pygame.sprite.GroupSingle(Background(self._assets, "background_blue.png"))
+        self.world = World(Settings.playground)
+        self._ship = Ship(self.world, self._scheduler)
         self._all_rocks = pygame.sprite.Group()
-        self._timer_rock = Timer(Settings.rock_intervall, True)
+        self._all_sprites = pygame.sprite.Group(self._ship)
+        self._render_queue = RenderQueue()
+        for layer in Settings.layers.values():
+            self._render_queue.set_cull(layer, Settings.playground)
+        self._drawn_rects: list[pygame.Rect] = []  # areas of the last frame which are restored with dirty rendering
+        self._full_redraw = True
+        self._particles: Optional[ParticleSystem] = None  # only visual, so not simulated headless
+        if not headless:
+            self._particles = ParticleSystem(Settings.playground, Settings.particle_capacity, cell_size=Settings.cell_size, seed=self.seed)
+        self._bullets = BulletPool(Settings.max_bullets)
+        self._timer_bullet = self._scheduler.timer(Settings.bullet_intervall)
+        self._firing = False
+        self._rock_hash = SpatialHash(Settings.playground, Settings.cell_size)
+        self._rock_pool = RockPool(Settings.rock_pool, self._random)
+        self._spawn_grid = OccupancyGrid(Settings.playground, Settings.cell_size)
+        self._timer_rock = self._scheduler.timer(Settings.rock_intervall)
+        self._lifes = Settings.lifes
+        self._game_over = False
         self._running = True
 
+    @staticmethod
+    def load_sprites(digest: Optional[bytes] = None, headless: bool = False) -> SpriteContainer:
+        """Loads the sprites of the game from the compiled atlas; the atlas is (re)compiled if necessary.
+
+        Args:
+            digest (bytes, optional): Content hash of the sources if already known. Defaults to None.
+            headless (bool, optional): True = the sprites are never drawn and stay in the memory-mapped atlas. Defaults to False.
+
+        Returns:
+            SpriteContainer: the sprites
+        """
+        return SpriteContainer(
+            Settings.get_file("sprites.json"),
+            Settings.get_image("spritesheet.bmp"),
+            (0, 0, 0),
+            Settings.get_file("sprites.atlas"),
+            digest,
+            not headless,
+        )
+
+    def handle_event(self, event: pygame.event.Event) -> None:
+        """Pokes the reaction to a single event.
+
+        Args:
+            event (pygame.event.Event): Event from the event queue or from a script.
+        """
+        if self._input_log is not None:
+            self._input_log.record(self.frame, event)
+        if event.type == QUIT:
+            self._running = False
+        elif event.type == KEYDOWN:
+            if event.key == K_ESCAPE:
+                self._running = False
+            elif event.key == K_UP:
+                self._ship.set_mode(1)
+            elif event.key == K_LEFT:
+                self._ship.rotate(1)
+            elif event.key == K_RIGHT:
+                self._ship.rotate(-1)
+            elif event.key == K_SPACE:
+                self._firing = True
+            elif event.key == K_F3:
+                self.profiler.enabled = True
+                self.profiler.overlay = not self.profiler.overlay
+        elif event.type == KEYUP:
+            if event.key == K_UP:
+                self._ship.set_mode(0)
+            elif event.key == K_SPACE:
+                self._firing = False
+        elif event.type == VIDEORESIZE and not self._headless:
+            self._target.resize(event.size)
+            self._screen = self._target.surface
+            self._full_redraw = True
+
     def watch_for_events(self) -> None:
         """Looking for any type of event and poke a reaction."""
         for event in pygame.event.get():
-            if event.type == QUIT:
-                self._running = False
-            elif event.type == KEYDOWN:
-                if event.key == K_ESCAPE:
-                    self._running = False
-                elif event.key == K_UP:
-                    self._ship.update(mode=1)
-                elif event.key == K_LEFT:
-                    self._ship.update(direction=1)
-                elif event.key == K_RIGHT:
-                    self._ship.update(direction=-1)
-            elif event.type == KEYUP:
-                if event.key == K_UP:
-                    self._ship.update(mode=0)
+            self.handle_event(event)
 
     def draw(self) -> None:
-        """Draws all sprite on the screen."""
-        self._background.draw(self._screen)
-        self._ship.draw(self._screen)
-        self._all_rocks.draw(self._screen)
-        pygame.display.flip()
+        """Draws all sprite on the screen.
+
+        Ship, bullets and rocks are collected in the render queue and drawn in layer order by a
+        single Surface.blits call. With Settings.dirty_rendering only the areas of the sprites at their old and new
+        positions are restored from the background, redrawn and updated on the display.
+        Sprites crossing an edge are drawn a second time as ghosts on the opposite edge (see
+        Torus); the ghosts are part of the updated rects like the sprites themselves. Particles
+        are drawn below the sprites; their cells are updated as well. A headless game draws nothing.
+        """
+        if self._headless:
+            return
+        self._assets.poll()
+        if self._background.sprite.refresh():
+            self._full_redraw = True
+        queue = self._render_queue
+        queue.add_sprites(self._all_rocks, Settings.layers["rocks"])
+        queue.add_sprites(self._bullets.active, Settings.layers["bullets"])
+        queue.add(self._ship.image, self._ship.rect, Settings.layers["ships"])
+        for sprites, layer in ((self._all_rocks, "rocks"), (self._bullets.active, "bullets"), ((self._ship,), "ships")):
+            for image, rect in Settings.torus.ghosts(sprites):
+                queue.add(image, rect, Settings.layers[layer])
+        if not Settings.dirty_rendering or self._full_redraw:
+            self._background.draw(self._screen)
+            particles = self._particles.draw(self._screen, Settings.dirty_rendering)
+            self._drawn_rects = particles + queue.flush(self._screen, Settings.dirty_rendering)
+            self._draw_overlay()
+            self._target.present()
+            self._full_redraw = False
+        else:
+            background = self._background.sprite.image
+            self._screen.blits([(background, rect, rect) for rect in self._drawn_rects], doreturn=False)
+            rects = self._particles.draw(self._screen, True) + queue.flush(self._screen, True)
+            self._target.present(self._drawn_rects + rects + self._draw_overlay())
+            self._drawn_rects = rects
+
+    def _draw_overlay(self) -> list[pygame.Rect]:
+        """Draws the profiler values below the playground.
+
+        Returns:
+            list[pygame.Rect]: changed areas of the screen
+        """
+        rects = []
+        if self._overlay_rect is not None:
+            self._screen.blit(self._background.sprite.image, self._overlay_rect, self._overlay_rect)
+            rects.append(self._overlay_rect)
+            self._overlay_rect = None
+        if self.profiler.overlay:
+            self._overlay_rect = self.profiler.draw_overlay(self._screen, (5, Settings.playground.bottom + 5))
+            rects.append(self._overlay_rect)
+        return rects
 
     def update(self) -> None:
-        """This method is responsible for the main game logic."""
+        """This method is responsible for the main game logic.
+
+        The ship reacts to the input; then the systems of the world move all entities at once
+        and count down the lifetimes of the bullets.
+        """
         if self._timer_rock.is_next_stop_reached():
-            if len(self._all_rocks) < Settings.max_big_rocks:
-                rock = Rock("big")
-                while pygame.sprite.collide_rect(rock, self._ship):
-                    rock.update(action="newpos")
-                self._all_rocks.add(rock)
-        if self._running:
-            self._ship.update(go=True)
-            self._all_rocks.update(action="go")
+            self._spawn_rock([self._ship])
+        if self._running and not self._game_over:
+            self._ship.accelerate()
+            if self._firing and self._timer_bullet.is_next_stop_reached():
+                self._bullets.fire(self._ship, self._all_sprites)
+            self._run_systems()
+            self._check_collisions()
+        if self._particles is not None:
+            if self._ship.accelerating and self._ship.alive() and not self._game_over:
+                self._emit_exhaust(self._ship)
+            self._particles.update()
+
+    def _run_systems(self) -> None:
+        """Moves all entities, releases the expired bullets and updates the rects of the sprites."""
+        self.world.move()
+        for bullet in self.world.expire():
+            self._bullets.release(bullet)
+        self.world.sync()
+
+    def _emit_exhaust(self, ship: Ship) -> None:
+        """Emits particles from the rear of an accelerating ship against its heading.
+
+        Args:
+            ship (Ship): the ship
+        """
+        sine, cosine = Settings.headings.vector(ship.imageindex)
+        distance = ship.rect.height / 3
+        rear = (ship.rect.centerx + distance * sine, ship.rect.centery + distance * cosine)
+        self._particles.emit(
+            rear,
+            Settings.exhaust_particles,
+            velocity=(ship.speed_x, ship.speed_y),
+            direction=(sine, cosine),
+            spread=0.35,
+            speed=(1.0, 3.0),
+            lifetime=(10, 25),
+            color=(255, 170, 60),
+        )
+
+    def _emit_explosion(self, rock: Rock) -> None:
+        """Emits debris in all directions from the center of a destroyed rock.
+
+        Args:
+            rock (Rock): the rock
+        """
+        self._particles.emit(
+            rock.rect.center,
+            Settings.explosion_particles.get(rock.size, 0),
+            velocity=(rock.speed_x, rock.speed_y),
+            speed=(0.5, 4.0),
+            lifetime=(30, 90),
+            color=(210, 200, 180),
+        )
+
+    def _spawn_rock(self, ships: list[Ship]) -> None:
+        """Puts a new big rock at a random position which does not touch any ship.
+
+        Args:
+            ships (list[Ship]): ships which must not be hit by the new rock
+        """
+        if self._rock_pool.in_use("big") < Settings.max_big_rocks:
+            self.spawn_wave(1, "big", ships)
+
+    def spawn_wave(self, count: int, size: str = "big", ships: Optional[list[Ship]] = None) -> int:
+        """Puts new rocks at random positions which neither overlap other rocks nor come near a ship.
+
+        The free positions are taken from an occupancy grid, so the cost is O(number of rocks)
+        for the whole wave and never depends on luck.
+
+        Args:
+            count (int): number of new rocks
+            size (str, optional): size of the rocks; see Settings.rock_tiers. Defaults to "big".
+            ships (list[Ship], optional): ships which keep Settings.spawn_safe_radius free; None = the ship of the player. Defaults to None.
+
+        Returns:
+            int: number of placed rocks; less than count if the pool or the playground is full
+        """
+        grid = self._spawn_grid
+        grid.clear()
+        rocks = self.world.of_kind(KIND_ROCK)
+        grid.mark_rects(self.world.toplefts()[rocks], self.world.sizes[rocks])
+        for ship in [self._ship] if ships is None else ships:
+            grid.mark_circle(ship.rect.center, Settings.spawn_safe_radius)
+        for placed in range(count):
+            rock = self._rock_pool.acquire(size)
+            if rock is None:
+                return placed
+            position = grid.sample(self._random, rock.rect.size)
+            if position is None:
+                self._rock_pool.release(rock)
+                return placed
+            rock.rect.topleft = position
+            self.add_rock(rock)
+        return count
+
+    def add_rock(self, rock: Rock) -> None:
+        """Puts a rock into the game.
+
+        Args:
+            rock (Rock): rock at its start position
+        """
+        self._all_rocks.add(rock)
+        self._all_sprites.add(rock)
+        position = (to_fixed(rock.rect.left), to_fixed(rock.rect.top))
+        velocity = to_fixed_array((rock.speed_x, rock.speed_y))
+        self.world.spawn(KIND_ROCK, position, velocity, rock.rect.size, rock.index, sprite=rock)
+
+    def _destroy_rock(self, rock: Rock, fragment: bool) -> None:
+        """Removes a rock from the game; on demand it breaks into fragments of the next smaller size.
+
+        The fragments start at the center of the rock and inherit a part of its velocity.
+
+        Args:
+            rock (Rock): the hit rock
+            fragment (bool): True = the rock breaks into Settings.fragment_count fragments
+        """
+        self._rock_hash.remove(rock)
+        self._rock_pool.release(rock)
+        if self._particles is not None:
+            self._emit_explosion(rock)
+        size = Settings.rock_fragments.get(rock.size)
+        if not fragment or size is None:
+            return
+        for _ in range(Settings.fragment_count):
+            child = self._rock_pool.acquire(size)
+            if child is None:
+                break
+            child.speed_x += Settings.fragment_inheritance * rock.speed_x
+            child.speed_y += Settings.fragment_inheritance * rock.speed_y
+            child.rect.center = rock.rect.center
+            self.add_rock(child)
+
+    def _check_collisions(self) -> None:
+        """Looks for rocks hitting the ship or hit by bullets.
+
+        The rocks are sorted into the spatial hash, so only rocks near the ship or a bullet
+        are tested pixel-perfect by their masks. A bullet hit destroys the bullet and breaks
+        the rock into fragments. A hit of the ship destroys the rock and costs a life.
+        """
+        self._rock_hash.rebuild(self._all_rocks)
+        self._check_bullet_hits()
+        if self._check_ship_hit(self._ship):
+            self._lifes -= 1
+            if self._lifes > 0:
+                self._ship.respawn()
+            else:
+                self._game_over = True
+
+    def _check_bullet_hits(self) -> None:
+        """Releases bullets which hit a rock and breaks the hit rocks; the spatial hash must be up to date.
+
+        All hits are collected before a rock is destroyed: a destroyed rock goes back to the pool
+        and may return at once as fragment elsewhere, where the hits of later bullets must not reach it.
+        """
+        hit_rocks: Dict[Rock, None] = {}  # ordered set; a rock hit by several bullets breaks once
+        for bullet, rocks in self._rock_hash.collide_all(self._bullets.active.sprites()).items():
+            self._bullets.release(bullet)
+            hit_rocks.update(dict.fromkeys(rocks))
+        for rock in hit_rocks:
+            self._destroy_rock(rock, True)
+
+    def _check_ship_hit(self, ship: Ship) -> bool:
+        """Destroys all rocks hitting a ship; the spatial hash must be up to date.
+
+        Args:
+            ship (Ship): the ship
+
+        Returns:
+            bool: True = the ship has been hit
+        """
+        hits = self._rock_hash.collide(ship)
+        for rock in hits:
+            self._destroy_rock(rock, False)
+        return len(hits) > 0
+
+    def set_background(self, filename: str) -> None:
+        """Switches the background image without stalling the game; the old image remains until the new one is loaded.
+
+        Args:
+            filename (str): Filename of the background image.
+        """
+        if not self._headless:
+            self._background.sprite.set_image(filename)
+
+    def is_over(self) -> bool:
+        """Checks whether all lifes are lost.
+
+        Returns:
+            bool: True = game over
+        """
+        return self._game_over
+
+    def step(self, events: Iterable[pygame.event.Event] = ()) -> None:
+        """Advances the game logic by exactly one fixed time step.
+
+        Args:
+            events (Iterable[pygame.event.Event], optional): Events which are handled before the step. Defaults to ().
+        """
+        for event in events:
+            self.handle_event(event)
+        self._scheduler.advance(Settings.timestep)
+        self.update()
+        self.frame += 1
+
+    def simulate(self, frames: int) -> int:
+        """Runs the game logic without drawing and without waiting for the wall-clock.
+
+        Args:
+            frames (int): Maximum number of simulation steps.
+
+        Returns:
+            int: Number of simulated steps; less than frames if the game was stopped or is over.
+        """
+        for frame in range(frames):
+            if not self._running or self._game_over:
+                return frame
+            self.profiler.begin_frame()
+            with self.profiler.phase("update"):
+                self.step()
+            self.profiler.count("steps", 1)
+            self.profiler.count("sprites", len(self._all_sprites))
+            self.profiler.end_frame()
+        return frames
 
     def run(self) -> None:
-        """Starting point and main loop of the game."""
+        """Starting point and main loop of the game.
+
+        The game logic runs in fixed time steps of Settings.timestep. Slow frames are caught up
+        with several steps (at most Settings.max_steps), fast frames wait for the next step.
+        Without a window the steps are not paced and the loop ends with the game; use simulate
+        for a fixed number of steps.
+        """
         self._running = True
-        while self._running:
-            self._clock.tick(Settings.fps)
-            self.watch_for_events()
-            self.update()
-            self.draw()
+        if self._headless:
+            while self._running and not self.is_over():
+                self.step(pygame.event.get())
+        else:
+            lag = 0.0
+            profiler = self.profiler
+            while self._running:
+                lag += self._clock.tick(Settings.fps)
+                profiler.begin_frame()
+                with profiler.phase("events"):
+                    self.watch_for_events()
+                steps = 0
+                with profiler.phase("update"):
+                    while lag >= Settings.timestep and steps < Settings.max_steps:
+                        self.step()
+                        lag -= Settings.timestep
+                        steps += 1
+                lag = min(lag, Settings.timestep)
+                with profiler.phase("draw"):
+                    self.draw()
+                profiler.count("steps", steps)
+                profiler.count("sprites", len(self._all_sprites))
+                profiler.end_frame()
+        if self.profiler.enabled and len(self.profiler) > 0:
+            print(self.profiler.summary())
+        if not self._headless:
+            self._assets.shutdown()
 
         pygame.quit()
 
 
+def _parse_size(text: str) -> Tuple[int, int]:
+    """Converts WIDTHxHEIGHT into a tuple."""
+    try:
+        width, height = (int(value) for value in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}") from None
+    return width, height
+
+
 def main():
+    parser = argparse.ArgumentParser(description=Settings.caption)
+    parser.add_argument("--seed", type=int, help="seed of the random number generator")
+    parser.add_argument("--record", metavar="FILE", help="records the input events into FILE")
+    parser.add_argument("--replay", metavar="FILE", help="re-simulates a recorded session headless")
+    parser.add_argument("--profile", metavar="FILE", help="exports the frame timings as CSV or JSON (*.json)")
+    parser.add_argument("--display", metavar="WIDTHxHEIGHT", type=_parse_size, help="size of the window; the game is scaled to it")
+    parser.add_argument("--fullscreen", action="store_true", help="covers the whole display")
+    parser.add_argument("--integer-scaling", action="store_true", help="enlarges the game only by whole factors, even with wide borders")
+    args = parser.parse_args()
+    Settings.display = args.display
+    Settings.fullscreen = args.fullscreen
+    if args.integer_scaling:
+        Settings.integer_coverage = 0
+    if args.replay:
+        log = InputLog.load(args.replay)
+        game = Game(headless=True, seed=log.seed)
+        frames = ReplayPlayer(log).play(game)
+        print(f"replayed {frames} frames, game over: {game.is_over()}")
+        pygame.quit()
+        return
     os.environ["SDL_VIDEO_WINDOW_POS"] = "10, 30"
-    game = Game()
+    log = None
+    if args.record:
+        log = InputLog(args.seed if args.seed is not None else Random().randrange(2**63))
+    profiler = FrameProfiler() if args.profile else None
+    game = Game(seed=log.seed if log else args.seed, input_log=log, profiler=profiler)
     game.run()
+    if log:
+        log.frames = game.frame
+        log.save(args.record)
+    if profiler:
+        profiler.export(args.profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+"""Runs many headless games in parallel for play-testing and the evaluation of input policies.
+
+Every game gets its own seed and a scripted input policy. The games are distributed over a
+process pool; each worker loads the sprites once from the memory-mapped atlas, so the pixels
+are shared between the processes and sprites.json is not parsed again.
+
+Usage:
+    python batchrunner.py [--games N] [--workers N] [--frames N] [--policy NAME] [--seed SEED] [--output FILE]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from typing import Any, Callable, Optional
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from pygame.constants import K_LEFT, K_RIGHT, K_SPACE, K_UP, KEYDOWN, KEYUP
+
+from asteroids import Game, Settings
+from mytools import CompiledAtlas, SpriteContainer
+from profiler import FrameProfiler
+
+Policy = Callable[[int, Random], list[pygame.event.Event]]
+
+
+def idle_policy(frame: int, rng: Random) -> list[pygame.event.Event]:
+    """Does nothing; measures how long a motionless ship survives."""
+    return []
+
+
+def turret_policy(frame: int, rng: Random) -> list[pygame.event.Event]:
+    """Keeps firing and turns a little every quarter of a second."""
+    events = []
+    if frame == 0:
+        events.append(pygame.event.Event(KEYDOWN, key=K_SPACE))
+    if frame % 15 == 0:
+        events.append(pygame.event.Event(KEYDOWN, key=K_LEFT))
+    return events
+
+
+def random_policy(frame: int, rng: Random) -> list[pygame.event.Event]:
+    """Presses and releases random keys like a button masher."""
+    events = []
+    if rng.random() < 0.2:
+        events.append(pygame.event.Event(KEYDOWN, key=rng.choice((K_LEFT, K_RIGHT))))
+    if rng.random() < 0.05:
+        events.append(pygame.event.Event(rng.choice((KEYDOWN, KEYUP)), key=rng.choice((K_UP, K_SPACE))))
+    return events
+
+
+POLICIES: dict[str, Policy] = {"idle": idle_policy, "turret": turret_policy, "random": random_policy}
+
+_sprites: Optional[SpriteContainer] = None  # sprites of the worker process
+
+
+def _init_worker(digest: bytes) -> None:
+    """Loads the sprites of a worker process once from the compiled atlas.
+
+    Args:
+        digest (bytes): content hash of the sprite sources computed by the parent process
+    """
+    global _sprites
+    pygame.init()
+    pygame.display.set_mode(Settings.get_dim())
+    _sprites = Game.load_sprites(digest, headless=True)
+
+
+def run_game(seed: int, policy: str, frames: int) -> dict[str, Any]:
+    """Simulates a single game until it is over or the maximum number of frames is reached.
+
+    Args:
+        seed (int): seed of the game and of the policy
+        policy (str): key of POLICIES
+        frames (int): maximum number of simulated frames
+
+    Returns:
+        dict[str, Any]: result of the game including the time of each frame in milli seconds
+    """
+    profiler = FrameProfiler(capacity=max(1, frames))
+    game = Game(headless=True, seed=seed, profiler=profiler, sprites=_sprites)
+    rng = Random(seed)
+    script = POLICIES[policy]
+    start = time.perf_counter()
+    while game.frame < frames and not game.is_over():
+        profiler.begin_frame()
+        with profiler.phase("update"):
+            game.step(script(game.frame, rng))
+        profiler.end_frame()
+    return {
+        "seed": seed,
+        "policy": policy,
+        "frames": game.frame,
+        "game_over": game.is_over(),
+        "survival_ms": game.frame * Settings.timestep,
+        "wall_s": time.perf_counter() - start,
+        "frame_ms": profiler.frames()[:, FrameProfiler.COLUMNS.index("frame")],
+    }
+
+
+def prepare_atlas() -> bytes:
+    """Compiles the sprite atlas if it is missing or out of date, before the workers map it.
+
+    Returns:
+        bytes: content hash of the sprite sources
+    """
+    pygame.init()
+    pygame.display.set_mode(Settings.get_dim())
+    digest = CompiledAtlas.source_digest(Settings.get_file("sprites.json"), Settings.get_image("spritesheet.bmp"), (0, 0, 0))
+    Game.load_sprites(digest, headless=True)
+    pygame.quit()
+    return digest
+
+
+def run_batch(seeds: list[int], policy: str = "random", frames: int = 3600, workers: Optional[int] = None) -> dict[str, Any]:
+    """Simulates one game per seed on a process pool and aggregates the results.
+
+    Args:
+        seeds (list[int]): one seed per game
+        policy (str, optional): key of POLICIES. Defaults to "random".
+        frames (int, optional): maximum number of frames per game. Defaults to 3600.
+        workers (int, optional): number of processes; None = number of CPUs. Defaults to None.
+
+    Returns:
+        dict[str, Any]: per game results and totals
+    """
+    digest = prepare_atlas()
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")  # workers start without the pygame state of the parent
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(digest,)) as pool:
+        games = list(pool.map(run_game, seeds, [policy] * len(seeds), [frames] * len(seeds)))
+    wall = time.perf_counter() - start
+    frame_ms = np.concatenate([game.pop("frame_ms") for game in games])
+    for game in games:
+        game["wall_s"] = round(game["wall_s"], 4)
+    total = int(sum(game["frames"] for game in games))
+    survival = [game["survival_ms"] for game in games]
+    return {
+        "games": games,
+        "total_frames": total,
+        "wall_s": wall,
+        "frames_per_s": total / wall if wall > 0 else 0.0,
+        "survival_ms": {"mean": float(np.mean(survival)), "min": float(np.min(survival)), "max": float(np.max(survival))},
+        "game_over": sum(game["game_over"] for game in games),
+        "frame_ms": {f"p{p}": float(value) for p, value in zip((50, 95, 99), np.percentile(frame_ms, (50, 95, 99)))},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parallel headless simulation of " + Settings.caption)
+    parser.add_argument("--games", type=int, default=16, help="number of games")
+    parser.add_argument("--workers", type=int, help="number of processes (default: number of CPUs)")
+    parser.add_argument("--frames", type=int, default=3600, help="maximum number of frames per game")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="scripted input policy")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game; the others count up")
+    parser.add_argument("--output", metavar="FILE", help="writes the results as JSON into FILE")
+    args = parser.parse_args()
+    report = run_batch(list(range(args.seed, args.seed + args.games)), args.policy, args.frames, args.workers)
+    print(f"{len(report['games'])} games, {report['total_frames']} frames in {report['wall_s']:.2f} s")
+    print(f"throughput: {report['frames_per_s']:.0f} simulated frames/s")
+    print(f"game over: {report['game_over']}, survival ms: " + ", ".join(f"{k} {v:.0f}" for k, v in report["survival_ms"].items()))
+    print("frame ms: " + ", ".join(f"{k} {v:.3f}" for k, v in report["frame_ms"].items()))
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=1)
+
+
+if __name__ == "__main__":
+    main()
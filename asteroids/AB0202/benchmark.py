@@ -0,0 +1,307 @@
+"""Benchmarks of the simulation and rendering hot paths.
+
+All scenarios run under the SDL dummy video driver with fixed seeds, so results of different
+commits can be compared. The results are written as JSON.
+
+Usage:
+    python benchmark.py [--quick] [--filter TEXT] [--output FILE]
+    python benchmark.py --compare OLD NEW
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from random import Random
+from typing import Any, Callable, Iterator, NamedTuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from pygame.constants import K_LEFT, K_SPACE, K_UP, KEYDOWN
+
+from asteroids import KIND_ROCK, Game, Rock, Settings
+from ecs import World
+from fixedpoint import to_fixed_array
+from mytools import CompiledAtlas, SpriteContainer
+from particles import ParticleSystem
+
+SEED = 4711
+
+
+class Scenario(NamedTuple):
+    """A benchmark: setup returns the function which is measured."""
+
+    name: str
+    params: dict[str, Any]
+    setup: Callable[..., Callable[[], None]]
+    iterations: int
+    settings: dict[str, Any] = {}  # temporary changes of Settings
+    large: bool = False  # large scenarios are skipped with --quick
+
+
+@contextmanager
+def override(**settings: Any) -> Iterator[None]:
+    """Changes attributes of Settings temporarily."""
+    old = {name: getattr(Settings, name) for name in settings}
+    for name, value in settings.items():
+        setattr(Settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(Settings, name, value)
+
+
+def create_game(rocks: int) -> Game:
+    """Creates a game with a fixed seed and a number of big rocks which are not spawned by the game.
+
+    Args:
+        rocks (int): number of rocks
+
+    Returns:
+        Game: the game
+    """
+    game = Game(seed=SEED)
+    rng = Random(SEED)
+    for _ in range(rocks):
+        game.add_rock(Rock("big", rng))
+    return game
+
+
+def setup_ship_rotate() -> Callable[[], None]:
+    game = create_game(0)
+    ship = game._ship
+
+    def run() -> None:
+        game._scheduler.advance(Settings.timestep)
+        ship.rotate(1)
+        ship.accelerate()
+        game._run_systems()
+
+    return run
+
+
+def setup_ship_thrust() -> Callable[[], None]:
+    game = create_game(0)
+    ship = game._ship
+    ship.set_mode(1)
+
+    def run() -> None:
+        game._scheduler.advance(Settings.timestep)
+        ship.accelerate()
+        game._run_systems()
+
+    return run
+
+
+def setup_world_systems(rocks: int) -> Callable[[], None]:
+    game = create_game(rocks)
+    return game._run_systems
+
+
+def setup_world_move(rocks: int) -> Callable[[], None]:
+    world = World(Settings.playground)
+    rng = np.random.default_rng(SEED)
+    for _ in range(rocks):
+        world.spawn(KIND_ROCK, to_fixed_array(rng.uniform((0, 0), Settings.playground.size)), to_fixed_array(rng.uniform(-5, 5, 2)), (48, 42))
+    return world.move
+
+
+def setup_game_update(rocks: int) -> Callable[[], None]:
+    game = create_game(rocks)
+    return game.step
+
+
+def setup_bullet_storm(rocks: int) -> Callable[[], None]:
+    game = create_game(rocks)
+    game.step([pygame.event.Event(KEYDOWN, key=K_SPACE), pygame.event.Event(KEYDOWN, key=K_UP)])
+    rotate = [pygame.event.Event(KEYDOWN, key=K_LEFT)]
+
+    def run() -> None:
+        game.step(rotate)
+
+    return run
+
+
+def setup_container_load(atlas: bool) -> Callable[[], None]:
+    create_game(0)
+    atlasfile = Settings.get_file("sprites.atlas") if atlas else None
+    arguments = (Settings.get_file("sprites.json"), Settings.get_image("spritesheet.bmp"), (0, 0, 0), atlasfile)
+    SpriteContainer(*arguments)  # compiles the atlas if necessary
+
+    def run() -> None:
+        CompiledAtlas._cache.clear()  # every iteration maps and validates the file like a new process
+        SpriteContainer(*arguments)
+
+    return run
+
+
+def setup_game_draw(rocks: int, dirty: bool, display: str = "") -> Callable[[], None]:
+    Settings.display = tuple(int(value) for value in display.split("x")) if display else None
+    game = create_game(rocks)
+    Settings.dirty_rendering = dirty
+
+    def run() -> None:
+        game.step()
+        game.draw()
+
+    return run
+
+
+def setup_particles(particles: int) -> Callable[[], None]:
+    create_game(0)
+    screen = pygame.display.get_surface()
+    system = ParticleSystem(Settings.playground, particles, seed=SEED)
+    rng = Random(SEED)
+
+    def run() -> None:
+        system.emit((rng.uniform(0, Settings.playground.width), rng.uniform(0, Settings.playground.height)), particles // 50, lifetime=(50, 50))
+        system.update()
+        system.draw(screen, True)
+
+    for _ in range(50):  # the buffer is full from the start
+        run()
+    return run
+
+
+SCENARIOS = [
+    Scenario("ship_rotate", {}, setup_ship_rotate, 10000),
+    Scenario("ship_thrust", {}, setup_ship_thrust, 10000),
+    Scenario("world_systems", {"rocks": 10}, setup_world_systems, 2000),
+    Scenario("world_systems", {"rocks": 1000}, setup_world_systems, 50),
+    Scenario("world_systems", {"rocks": 100000}, setup_world_systems, 2, large=True),
+    Scenario("world_move", {"rocks": 10}, setup_world_move, 10000),
+    Scenario("world_move", {"rocks": 1000}, setup_world_move, 2000),
+    Scenario("world_move", {"rocks": 100000}, setup_world_move, 50, large=True),
+    Scenario("game_update", {"rocks": 10}, setup_game_update, 2000),
+    Scenario("game_update", {"rocks": 1000}, setup_game_update, 50),
+    Scenario("game_update", {"rocks": 100000}, setup_game_update, 2, large=True),
+    Scenario("bullet_storm", {"rocks": 200}, setup_bullet_storm, 200, {"bullet_intervall": 0, "max_bullets": 256}),
+    Scenario("particles", {"particles": 50000}, setup_particles, 200),
+    Scenario("container_load", {"atlas": False}, setup_container_load, 50),
+    Scenario("container_load", {"atlas": True}, setup_container_load, 50),
+    Scenario("game_draw", {"rocks": 10, "dirty": False}, setup_game_draw, 200),
+    Scenario("game_draw", {"rocks": 10, "dirty": True}, setup_game_draw, 200),
+    Scenario("game_draw", {"rocks": 1000, "dirty": False}, setup_game_draw, 20),
+    Scenario("game_draw", {"rocks": 1000, "dirty": True}, setup_game_draw, 20),
+    Scenario("game_draw", {"rocks": 1000, "dirty": True, "display": "1920x1080"}, setup_game_draw, 20),
+    Scenario("game_draw", {"rocks": 1000, "dirty": True, "display": "3840x2160"}, setup_game_draw, 20),
+]
+
+
+def scenario_id(scenario: Scenario) -> str:
+    """Unique name of a scenario including its parameters, e.g. "game_update[rocks=1000]"."""
+    if not scenario.params:
+        return scenario.name
+    return "{}[{}]".format(scenario.name, ",".join(f"{key}={value}" for key, value in scenario.params.items()))
+
+
+def measure(scenario: Scenario, repeats: int) -> dict[str, Any]:
+    """Runs a scenario and measures the time per iteration.
+
+    Args:
+        scenario (Scenario): the benchmark
+        repeats (int): number of measured rounds of scenario.iterations calls
+
+    Returns:
+        dict[str, Any]: times per iteration in milli seconds
+    """
+    settings = {"lifes": 10**9, "dirty_rendering": Settings.dirty_rendering, "display": Settings.display, **scenario.settings}
+    with override(**settings):
+        run = scenario.setup(**scenario.params)
+        run()  # warm up
+        rounds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(scenario.iterations):
+                run()
+            rounds.append((time.perf_counter() - start) * 1000 / scenario.iterations)
+    pygame.quit()
+    return {
+        "name": scenario.name,
+        "params": scenario.params,
+        "iterations": scenario.iterations,
+        "repeats": repeats,
+        "min_ms": min(rounds),
+        "median_ms": statistics.median(rounds),
+        "mean_ms": statistics.fmean(rounds),
+    }
+
+
+def metadata() -> dict[str, Any]:
+    """Describes the environment of a benchmark run."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "seed": SEED,
+    }
+
+
+def compare(oldfile: str, newfile: str, threshold: float = 0.05) -> None:
+    """Prints the change of the median times between two result files.
+
+    Args:
+        oldfile (str): results of the baseline
+        newfile (str): results to compare
+        threshold (float, optional): relative change which is marked. Defaults to 0.05.
+    """
+    with open(oldfile) as infile:
+        old = json.load(infile)["results"]
+    with open(newfile) as infile:
+        new = json.load(infile)["results"]
+    print(f"{'scenario':<45} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]["median_ms"] / old[key]["median_ms"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "slower"
+        elif ratio < 1 - threshold:
+            mark = "faster"
+        print(f"{key:<45} {old[key]['median_ms']:10.4f} {new[key]['median_ms']:10.4f} {ratio:7.2f} {mark}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks of the simulation and rendering hot paths")
+    parser.add_argument("--quick", action="store_true", help="skips the scenarios with 100k rocks")
+    parser.add_argument("--filter", default="", help="runs only scenarios whose name contains TEXT")
+    parser.add_argument("--repeats", type=int, default=5, help="measured rounds per scenario")
+    parser.add_argument("--output", metavar="FILE", help="writes the results as JSON into FILE")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compares two result files")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    results = {}
+    for scenario in SCENARIOS:
+        key = scenario_id(scenario)
+        if (args.quick and scenario.large) or args.filter not in key:
+            continue
+        results[key] = measure(scenario, args.repeats)
+        print(f"{key:<45} {results[key]['median_ms']:10.4f} ms", flush=True)
+    report = {"meta": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w") as outfile:
+            json.dump(report, outfile, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+from collections import defaultdict
+from typing import Callable, Iterable, Optional
+
+import pygame
+
+from torus import Torus
+
+
+class SpatialHash:
+    """Uniform grid over the playground as broadphase of the collision detection.
+
+    Each sprite is stored in every cell its rect or one of its ghosts touches (see Torus), so a
+    sprite which sticks out on one edge is also found by sprites near the opposite edge. Only
+    sprites sharing a cell are handed to the narrowphase, which measures across the edges too.
+
+    The cells are insertion ordered dicts instead of sets, so the results do not depend on the
+    memory addresses of the sprites and replays stay deterministic.
+    """
+
+    def __init__(self, playground: pygame.Rect, cell_size: int = 64) -> None:
+        """Constructor
+
+        Args:
+            playground (pygame.Rect): Area which is covered by the grid.
+            cell_size (int, optional): Width and height of a cell in pixel. Should be at least the size of the largest sprite. Defaults to 64.
+        """
+        self._playground = playground
+        self._torus = Torus(playground)
+        self._cell_size = cell_size
+        self._columns = max(1, -(-playground.width // cell_size))
+        self._rows = max(1, -(-playground.height // cell_size))
+        self._cells: defaultdict[int, dict[pygame.sprite.Sprite, None]] = defaultdict(dict)
+        self._keys: dict[pygame.sprite.Sprite, tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _cells_of(self, rect: pygame.Rect) -> tuple[int, ...]:
+        """Computes the keys of all cells touched by a rect and its ghosts.
+
+        Args:
+            rect (pygame.Rect): rect in playground coordinates
+
+        Returns:
+            tuple[int, ...]: keys of the cells
+        """
+        keys: dict[int, None] = {}
+        for part in [rect, *self._torus.ghost_rects(rect)]:
+            left = max(0, (part.left - self._playground.left) // self._cell_size)
+            right = min(self._columns - 1, (part.right - 1 - self._playground.left) // self._cell_size)
+            top = max(0, (part.top - self._playground.top) // self._cell_size)
+            bottom = min(self._rows - 1, (part.bottom - 1 - self._playground.top) // self._cell_size)
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    keys[row * self._columns + column] = None
+        return tuple(keys)
+
+    def clear(self) -> None:
+        """Removes all sprites."""
+        self._cells.clear()
+        self._keys.clear()
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        """Adds a sprite at the position of its rect.
+
+        Args:
+            sprite (pygame.sprite.Sprite): sprite with a rect
+        """
+        keys = self._cells_of(sprite.rect)
+        self._keys[sprite] = keys
+        for key in keys:
+            self._cells[key][sprite] = None
+
+    def remove(self, sprite: pygame.sprite.Sprite) -> None:
+        """Removes a sprite; unknown sprites are ignored.
+
+        Args:
+            sprite (pygame.sprite.Sprite): sprite to remove
+        """
+        for key in self._keys.pop(sprite, ()):
+            self._cells[key].pop(sprite, None)
+
+    def move(self, sprite: pygame.sprite.Sprite) -> None:
+        """Updates the cells of a sprite after its rect has changed.
+
+        Only sprites which enter other cells are rehashed.
+
+        Args:
+            sprite (pygame.sprite.Sprite): sprite which has been moved
+        """
+        keys = self._cells_of(sprite.rect)
+        if self._keys.get(sprite) != keys:
+            self.remove(sprite)
+            self._keys[sprite] = keys
+            for key in keys:
+                self._cells[key][sprite] = None
+
+    def rebuild(self, sprites: Iterable[pygame.sprite.Sprite]) -> None:
+        """Replaces the content of the grid.
+
+        Args:
+            sprites (Iterable[pygame.sprite.Sprite]): all sprites at their current position
+        """
+        self.clear()
+        for sprite in sprites:
+            self.insert(sprite)
+
+    def candidates(self, sprite: pygame.sprite.Sprite) -> list[pygame.sprite.Sprite]:
+        """Broadphase: all stored sprites which share at least one cell with the sprite.
+
+        Args:
+            sprite (pygame.sprite.Sprite): sprite with a rect; it does not have to be stored in the grid
+
+        Returns:
+            list[pygame.sprite.Sprite]: possible collision partners without the sprite itself in the order of insertion
+        """
+        result: dict[pygame.sprite.Sprite, None] = {}
+        for key in self._cells_of(sprite.rect):
+            cell = self._cells.get(key)
+            if cell:
+                result.update(cell)
+        result.pop(sprite, None)
+        return list(result)
+
+    def collide(
+        self,
+        sprite: pygame.sprite.Sprite,
+        collided: Optional[Callable[[pygame.sprite.Sprite, pygame.sprite.Sprite], object]] = None,
+    ) -> list[pygame.sprite.Sprite]:
+        """Broad- and narrowphase: all stored sprites which collide with the sprite.
+
+        Args:
+            sprite (pygame.sprite.Sprite): sprite with a rect and a mask
+            collided (Callable, optional): narrowphase test; None = pixel perfect test across the edges (Torus.collide_mask). Defaults to None.
+
+        Returns:
+            list[pygame.sprite.Sprite]: colliding sprites
+        """
+        if collided is None:
+            collided = self._torus.collide_mask
+        return [other for other in self.candidates(sprite) if collided(sprite, other)]
+
+    def collide_all(
+        self,
+        sprites: Iterable[pygame.sprite.Sprite],
+        collided: Optional[Callable[[pygame.sprite.Sprite, pygame.sprite.Sprite], object]] = None,
+    ) -> dict[pygame.sprite.Sprite, list[pygame.sprite.Sprite]]:
+        """Analogous to pygame.sprite.groupcollide, but only for candidates of the broadphase.
+
+        Args:
+            sprites (Iterable[pygame.sprite.Sprite]): sprites which are tested against the grid
+            collided (Callable, optional): narrowphase test; None = pixel perfect test across the edges (Torus.collide_mask). Defaults to None.
+
+        Returns:
+            dict[pygame.sprite.Sprite, list[pygame.sprite.Sprite]]: colliding stored sprites of all sprites with at least one collision
+        """
+        result = {}
+        for sprite in sprites:
+            hits = self.collide(sprite, collided)
+            if hits:
+                result[sprite] = hits
+        return result
@@ -0,0 +1,189 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import pygame
+
+from fixedpoint import ONE, SHIFT
+from torus import Torus
+
+
+class World:
+    """Entity-component store: the components of all entities are packed into NumPy arrays.
+
+    Every entity occupies a slot. The slots 0 ... len(world) - 1 are used without gaps, so the
+    systems (move, expire, sync) process all entities in bulk without masks. If a sprite is
+    attached to an entity, it is a view of its slot: its attributes `world` and `entity` are kept
+    up to date by the world, and sync copies the positions into its rect.
+
+    Components:
+        kind: type of the entity, e.g. ship, rock or bullet; only needed to select entities
+        position: anchor point in sub-pixels (see fixedpoint)
+        velocity: sub-pixels per step
+        size: width and height of the rect, which is also the collider of the broadphase
+        anchor: offset in pixels from the left and top of the rect to the position
+        frame: index of the image in the sprite sequence of the entity
+        lifetime: remaining steps; -1 = unlimited
+    """
+
+    COMPONENTS = ("_kinds", "_positions", "_velocities", "_sizes", "_anchors", "_frames", "_lifetimes")
+
+    def __init__(self, playground: pygame.Rect, capacity: int = 64) -> None:
+        """Constructor
+
+        Args:
+            playground (pygame.Rect): Area in which the entities are wrapped around.
+            capacity (int, optional): Initial number of slots; the arrays grow if necessary. Defaults to 64.
+        """
+        self._torus = Torus(playground, ONE)
+        self._count = 0
+        self._kinds = np.zeros(capacity, dtype=np.int8)
+        self._positions = np.zeros((capacity, 2), dtype=np.int64)
+        self._velocities = np.zeros((capacity, 2), dtype=np.int64)
+        self._sizes = np.zeros((capacity, 2), dtype=np.int32)
+        self._anchors = np.zeros((capacity, 2), dtype=np.int32)
+        self._frames = np.zeros(capacity, dtype=np.int32)
+        self._lifetimes = np.zeros(capacity, dtype=np.int32)
+        self._sprites: list[Optional[Any]] = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def kinds(self) -> np.ndarray:
+        """Type of all entities; shape (n,)."""
+        return self._kinds[: self._count]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """Position of all entities in sub-pixels; shape (n, 2)."""
+        return self._positions[: self._count]
+
+    @property
+    def velocities(self) -> np.ndarray:
+        """Speed in x and y direction of all entities in sub-pixels per step; shape (n, 2)."""
+        return self._velocities[: self._count]
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """Width and height of all entities; shape (n, 2)."""
+        return self._sizes[: self._count]
+
+    @property
+    def frames(self) -> np.ndarray:
+        """Index of the image of all entities in their sprite sequence; shape (n,)."""
+        return self._frames[: self._count]
+
+    @property
+    def lifetimes(self) -> np.ndarray:
+        """Remaining steps of all entities, -1 = unlimited; shape (n,)."""
+        return self._lifetimes[: self._count]
+
+    def toplefts(self) -> np.ndarray:
+        """Left and top of the rects of all entities in pixels; shape (n, 2)."""
+        return (self.positions >> SHIFT) - self._anchors[: self._count]
+
+    def of_kind(self, kind: int) -> np.ndarray:
+        """Mask of the entities of a type; shape (n,)."""
+        return self.kinds == kind
+
+    def _grow(self) -> None:
+        """Doubles the capacity of all component arrays."""
+        capacity = 2 * max(1, len(self._kinds))
+        for name in World.COMPONENTS:
+            array = getattr(self, name)
+            setattr(self, name, np.resize(array, (capacity, *array.shape[1:])))
+
+    def spawn(
+        self,
+        kind: int,
+        position: Tuple[int, int],
+        velocity: Tuple[int, int] = (0, 0),
+        size: Tuple[int, int] = (0, 0),
+        frame: int = 0,
+        lifetime: int = -1,
+        anchor: Tuple[int, int] = (0, 0),
+        sprite: Optional[Any] = None,
+    ) -> int:
+        """Adds an entity to the world.
+
+        Args:
+            kind (int): type of the entity
+            position (Tuple[int, int]): position in sub-pixels
+            velocity (Tuple[int, int], optional): speed in x and y direction in sub-pixels per step. Defaults to (0, 0).
+            size (Tuple[int, int], optional): width and height of the rect. Defaults to (0, 0).
+            frame (int, optional): index of the image in the sprite sequence. Defaults to 0.
+            lifetime (int, optional): number of steps until the entity expires; -1 = unlimited. Defaults to -1.
+            anchor (Tuple[int, int], optional): offset from left and top of the rect to the position, e.g. half the size for centers. Defaults to (0, 0).
+            sprite (Any, optional): Sprite whose rect follows the entity (see sync); it gets the attributes world and entity. Defaults to None.
+
+        Returns:
+            int: slot of the entity
+        """
+        if self._count == len(self._kinds):
+            self._grow()
+        slot = self._count
+        self._kinds[slot] = kind
+        self._positions[slot] = position
+        self._velocities[slot] = velocity
+        self._sizes[slot] = size
+        self._anchors[slot] = anchor
+        self._frames[slot] = frame
+        self._lifetimes[slot] = lifetime
+        self._sprites.append(sprite)
+        if sprite is not None:
+            sprite.world = self
+            sprite.entity = slot
+        self._count += 1
+        return slot
+
+    def despawn(self, slot: int) -> None:
+        """Removes an entity; the last entity moves into the free slot.
+
+        Args:
+            slot (int): slot of the entity
+        """
+        last = self._count - 1
+        if slot != last:
+            for name in World.COMPONENTS:
+                array = getattr(self, name)
+                array[slot] = array[last]
+            self._sprites[slot] = self._sprites[last]
+            if self._sprites[slot] is not None:
+                self._sprites[slot].entity = slot
+        self._sprites.pop()
+        self._count = last
+
+    def place(self, slot: int, position: Tuple[int, int]) -> None:
+        """Moves an entity to a new position.
+
+        Args:
+            slot (int): slot of the entity
+            position (Tuple[int, int]): position in sub-pixels
+        """
+        self._positions[slot] = position
+
+    def move(self) -> None:
+        """Movement system: moves all entities by their speed and wraps them around the edges of the playground."""
+        positions = self.positions
+        positions += self.velocities
+        self._torus.wrap(positions[:, 0], positions[:, 1])
+
+    def expire(self) -> list[Any]:
+        """Lifetime system: counts down the lifetimes of all mortal entities.
+
+        Expired entities remain in the world until they are despawned, usually by releasing their sprites.
+
+        Returns:
+            list[Any]: sprites of the entities which have expired in this step
+        """
+        lifetimes = self.lifetimes
+        mortal = lifetimes > 0
+        np.subtract(lifetimes, 1, out=lifetimes, where=mortal)
+        expired = np.flatnonzero(mortal & (lifetimes == 0)).tolist()
+        return [self._sprites[slot] for slot in expired if self._sprites[slot] is not None]
+
+    def sync(self) -> None:
+        """Render system: copies the positions, rounded down to whole pixels, into the rects of the attached sprites."""
+        for sprite, topleft in zip(self._sprites, self.toplefts().tolist()):
+            if sprite is not None:
+                sprite.rect.topleft = topleft
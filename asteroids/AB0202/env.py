@@ -0,0 +1,309 @@
+"""Batched environment for training agents: many games are simulated at once in NumPy arrays.
+
+The rules follow Game: the ship rotates in steps of Settings.d_angle, accelerates every 100 ms
+while the thrust is on, fires every Settings.bullet_intervall, big rocks appear every
+Settings.rock_intervall and break into fragments when hit. Unlike Game no sprites are used:
+ships, rocks and bullets are circles, and the playground is a torus.
+
+Example:
+    env = BatchedEnv(1024, seed=1)
+    observations = env.reset()
+    actions = np.zeros((1024, 3), dtype=np.int8)  # direction, mode, fire
+    observations, rewards, dones = env.step(actions)
+"""
+import json
+from typing import Optional
+
+import numpy as np
+
+from asteroids import Settings
+from torus import Torus
+
+DIRECTION, MODE, FIRE = 0, 1, 2  # columns of an action
+TIERS = ("big", "medium", "small", "tiny")  # index of a tier = generation of its fragments
+
+
+def _sprite_radii() -> tuple[float, float, np.ndarray]:
+    """Collision radii of ship, bullet and rock tiers derived from the sprite rects.
+
+    Returns:
+        tuple[float, float, np.ndarray]: radius of the ship, radius of a bullet, radius per tier
+    """
+    with open(Settings.get_file("sprites.json")) as infile:
+        rects = json.load(infile)
+
+    def radius(sequence: str, indices: range) -> float:
+        return float(np.mean([min(rects[sequence][str(index)][2:]) / 2 for index in indices]))
+
+    rocks = [radius("rocks", range(first, last + 1)) for _, first, last in (Settings.rock_tiers[tier] for tier in TIERS)]
+    return radius("ships_flying", range(1)), radius("bullets", range(Settings.bullet_index, Settings.bullet_index + 1)), np.array(rocks)
+
+
+class BatchedEnv:
+    """K independent games stepped together with a gym-like interface.
+
+    All state is kept in preallocated arrays; a step does not create any Python object per env.
+    Coordinates are the first axis of the position and velocity arrays, e.g. rock_position has
+    the shape (2, K, max_rocks), so NumPy runs over long contiguous rows instead of pairs.
+    Finished envs are reset automatically at the end of step().
+
+    Actions: integer array of shape (K, 3) with the columns
+        DIRECTION: -1 = rotate right, 0 = keep the heading, +1 = rotate left (Ship.rotate)
+        MODE: 0 = flying, 1 = accelerating (Ship.set_mode)
+        FIRE: 0 = hold fire, 1 = fire
+
+    Observations: float32 array of shape (K, 7 + 6 * max_rocks)
+        ship: x, y (0..1), speed x, speed y (/ 10), sine and cosine of the heading, lifes
+        rocks: six blocks of max_rocks values: distance x, distance y (minimal image, / playground size),
+            speed x, speed y (/ 10), radius (/ 32), alive; free slots are 0
+    """
+
+    SHIP_FEATURES = 7
+    ROCK_FEATURES = 6
+
+    def __init__(
+        self,
+        num_envs: int,
+        max_rocks: int = 32,
+        max_bullets: int = 8,
+        max_frames: Optional[int] = None,
+        life_penalty: float = 10.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            num_envs (int): number of parallel games K
+            max_rocks (int, optional): rock slots per game; fragments are dropped if all slots are used. Defaults to 32.
+            max_bullets (int, optional): bullet slots per game. Defaults to 8.
+            max_frames (int, optional): episodes are cut after this number of steps; None = only game over ends an episode. Defaults to None.
+            life_penalty (float, optional): negative reward for a lost life; every rock hit by a bullet yields +1. Defaults to 10.0.
+            seed (int, optional): seed of the random number generator. Defaults to None.
+        """
+        self.num_envs = num_envs
+        self.max_rocks = max_rocks
+        self.max_bullets = max_bullets
+        self.max_frames = max_frames
+        self.life_penalty = life_penalty
+        self._rng = np.random.default_rng(seed)
+        self._width, self._height = (float(value) for value in Settings.playground.size)
+        self._center = (self._width / 2, self._height / 2)
+        self._torus = Torus(Settings.playground)
+        self._units = Settings.headings.array.T.astype(np.float32)  # (2, headings): sine, cosine
+        self._rock_units = Settings.rock_angles.array.T.astype(np.float32)
+        self._ship_radius, self._bullet_radius, self._tier_radius = _sprite_radii()
+        self._tier_speed = np.array([Settings.rock_tiers[tier][0] for tier in TIERS], dtype=np.float32)
+        self._bullet_lifetime = int(Settings.bullet_lifetime / Settings.timestep)  # steps; the range may end the flight earlier
+        self._time = 0.0
+
+        k, r, b = num_envs, max_rocks, max_bullets
+        self.ship_position = np.zeros((2, k), dtype=np.float32)
+        self.ship_velocity = np.zeros((2, k), dtype=np.float32)
+        self.heading = np.zeros(k, dtype=np.int64)
+        self.lifes = np.zeros(k, dtype=np.int64)
+        self.frames = np.zeros(k, dtype=np.int64)
+        self.rock_position = np.zeros((2, k, r), dtype=np.float32)
+        self.rock_velocity = np.zeros((2, k, r), dtype=np.float32)
+        self.rock_tier = np.full((k, r), -1, dtype=np.int64)  # -1 = free slot
+        self.rock_radius = np.zeros((k, r), dtype=np.float32)  # 0 = free slot
+        self.bullet_position = np.zeros((2, k, b), dtype=np.float32)
+        self.bullet_velocity = np.zeros((2, k, b), dtype=np.float32)
+        self.bullet_steps = np.zeros((k, b), dtype=np.int64)  # remaining steps; 0 = free slot
+        self._observations = np.zeros((k, BatchedEnv.SHIP_FEATURES + BatchedEnv.ROCK_FEATURES * r), dtype=np.float32)
+        self._rewards = np.zeros(k, dtype=np.float32)
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Starts new episodes.
+
+        Args:
+            mask (np.ndarray, optional): boolean array of the envs to reset; None = all envs. Defaults to None.
+
+        Returns:
+            np.ndarray: observations of all envs; the array is reused by the next call
+        """
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        self._respawn(mask)
+        self.heading[mask] = 0
+        self.lifes[mask] = Settings.lifes
+        self.frames[mask] = 0
+        self.rock_tier[mask] = -1
+        self.rock_radius[mask] = 0
+        self.bullet_steps[mask] = 0
+        return self._observe()
+
+    def _respawn(self, mask: np.ndarray) -> None:
+        """Places the ships of the masked envs motionless in the center of the playground."""
+        self.ship_position[0, mask], self.ship_position[1, mask] = self._center
+        self.ship_velocity[:, mask] = 0
+
+    def _due(self, period: float) -> bool:
+        """Checks whether a periodic timer of the given period elapses in the current step."""
+        return int(self._time // period) != int((self._time - Settings.timestep) // period)
+
+    def _move(self, positions: np.ndarray, velocities: np.ndarray) -> None:
+        """Moves positions in place and wraps them around the edges of the playground."""
+        positions += velocities
+        self._torus.wrap(positions[0], positions[1])
+
+    def _place_rocks(self, envs: np.ndarray, slots: np.ndarray, tiers: np.ndarray, positions: np.ndarray, inherited: np.ndarray) -> None:
+        """Puts rocks with a random direction into free slots; positions and inherited have the shape (2, n)."""
+        units = self._rock_units[:, self._rng.integers(0, 360, len(envs))]
+        speed = self._tier_speed[tiers]
+        self.rock_tier[envs, slots] = tiers
+        self.rock_radius[envs, slots] = self._tier_radius[tiers]
+        self.rock_position[:, envs, slots] = positions
+        self.rock_velocity[:, envs, slots] = speed * units + inherited
+
+    def _free_slots(self, envs: np.ndarray, ranks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the ranks-th free rock slot of each env.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: slots and a mask of the requests which could be served
+        """
+        free = self.rock_tier[envs] < 0
+        order = np.argsort(~free, axis=1, kind="stable")
+        valid = ranks < free.sum(axis=1)
+        return order[np.arange(len(envs)), np.minimum(ranks, self.max_rocks - 1)], valid
+
+    def _spawn_big_rocks(self) -> None:
+        """Adds a big rock to every env with less than Settings.max_big_rocks big rocks, Settings.spawn_safe_radius away from the ship."""
+        envs = np.flatnonzero(((self.rock_tier == 0).sum(axis=1) < Settings.max_big_rocks) & (self.rock_tier < 0).any(axis=1))
+        if len(envs) == 0:
+            return
+        slots, _ = self._free_slots(envs, np.zeros(len(envs), dtype=np.int64))
+        positions = self._rng.uniform((0, 0), (self._width, self._height), (len(envs), 2)).T.astype(np.float32)
+        dx, dy = positions - self.ship_position[:, envs]
+        self._torus.minimal(dx, dy)
+        near = np.hypot(dx, dy) < Settings.spawn_safe_radius + self._tier_radius[0]
+        positions[:, near] += ((self._width / 2,), (self._height / 2,))  # opposite side of the torus
+        self._move(positions, 0)
+        self._place_rocks(envs, slots, np.zeros(len(envs), dtype=np.int64), positions, 0)
+
+    def _break_rocks(self, envs: np.ndarray, slots: np.ndarray) -> None:
+        """Replaces hit rocks by Settings.fragment_count fragments of the next smaller tier.
+
+        The hit rocks which break keep their slots until the free slots for the further
+        fragments are found, so no fragment is put into the slot of another one.
+
+        Example (every hit big rock yields two medium rocks):
+            >>> env = BatchedEnv(1, max_rocks=8, seed=1)
+            >>> _ = env.reset()
+            >>> env.rock_tier[0, :4] = 0
+            >>> env._break_rocks(np.array([0, 0]), np.array([1, 3]))
+            >>> env.rock_tier[0].tolist()
+            [0, 1, 0, 1, 1, 1, -1, -1]
+        """
+        tiers = self.rock_tier[envs, slots]
+        breaking = tiers + 1 < len(TIERS)
+        self.rock_tier[envs[~breaking], slots[~breaking]] = -1
+        self.rock_radius[envs[~breaking], slots[~breaking]] = 0
+        envs, slots, tiers = envs[breaking], slots[breaking], tiers[breaking] + 1
+        if len(envs) == 0:
+            return
+        positions = self.rock_position[:, envs, slots]
+        inherited = Settings.fragment_inheritance * self.rock_velocity[:, envs, slots]
+        ranks = np.arange(len(envs)) - np.searchsorted(envs, envs)  # number of earlier hits in the same env
+        targets = [(slots, np.ones(len(envs), dtype=bool))]  # the first fragment takes the slot of the rock
+        for child in range(1, Settings.fragment_count):
+            targets.append(self._free_slots(envs, ranks * (Settings.fragment_count - 1) + child - 1))
+        for child_slots, valid in targets:
+            self._place_rocks(envs[valid], child_slots[valid], tiers[valid], positions[:, valid], inherited[:, valid])
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Advances all envs by one time step of Settings.timestep.
+
+        Args:
+            actions (np.ndarray): integer array of shape (K, 3); see class documentation
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: observations, rewards and dones; the arrays are reused by the next call.
+                Envs which are done are already reset, their observation is the first of the new episode.
+        """
+        actions = np.asarray(actions)
+        self._time += Settings.timestep
+        self.frames += 1
+        rewards = self._rewards
+        rewards[:] = 0
+
+        # ship: rotation, thrust with speed limit, movement
+        self.heading += actions[:, DIRECTION]
+        self.heading %= self._units.shape[1]
+        units = self._units[:, self.heading]
+        if self._due(100):
+            velocity = self.ship_velocity - units
+            accelerating = (actions[:, MODE] == 1) & (np.abs(velocity) < 10).all(axis=0)
+            self.ship_velocity[:, accelerating] = velocity[:, accelerating]
+        self._move(self.ship_position, self.ship_velocity)
+
+        # bullets: fire into the first free slot, move, expire; expired bullets hit nothing (Game._run_systems)
+        if self._due(Settings.bullet_intervall):
+            free = self.bullet_steps == 0
+            envs = np.flatnonzero((actions[:, FIRE] == 1) & free.any(axis=1))
+            slots = free[envs].argmax(axis=1)
+            velocity = self.ship_velocity[:, envs] - Settings.bullet_speed * units[:, envs]
+            self.bullet_position[:, envs, slots] = self.ship_position[:, envs]
+            self.bullet_velocity[:, envs, slots] = velocity
+            steps = np.ceil(Settings.bullet_range / np.maximum(np.hypot(*velocity), 1e-3))  # range at the actual speed (Bullet.fire)
+            self.bullet_steps[envs, slots] = np.minimum(self._bullet_lifetime, steps)
+        self._move(self.bullet_position, self.bullet_velocity)
+        envs, slots = np.nonzero(self.bullet_steps)
+        self.bullet_steps[envs, slots] -= 1
+        envs, slots = np.nonzero(self.bullet_steps)
+
+        # rocks: move and spawn
+        self._move(self.rock_position, self.rock_velocity)
+        if self._due(Settings.rock_intervall):
+            self._spawn_big_rocks()
+
+        # bullets hitting rocks: only the flying bullets are tested against the rocks of their env
+        dx, dy = self.bullet_position[:, envs, slots, None] - self.rock_position[:, envs]
+        self._torus.minimal(dx, dy)
+        radius = self.rock_radius[envs]
+        hits = (dx * dx + dy * dy < (radius + self._bullet_radius) ** 2) & (radius > 0)
+        hit = hits.any(axis=1)
+        self.bullet_steps[envs[hit], slots[hit]] = 0
+        rocks = np.zeros_like(self.rock_radius, dtype=bool)
+        bullets, rock_slots = np.nonzero(hits)
+        rocks[envs[bullets], rock_slots] = True
+        envs, slots = np.nonzero(rocks)
+        np.add.at(rewards, envs, 1.0)
+        self._break_rocks(envs, slots)
+
+        # rocks hitting the ship
+        dx, dy = self.rock_position - self.ship_position[:, :, None]
+        self._torus.minimal(dx, dy)
+        hits = (dx * dx + dy * dy < (self.rock_radius + self._ship_radius) ** 2) & (self.rock_radius > 0)
+        self.rock_tier[hits] = -1
+        self.rock_radius[hits] = 0
+        hit = hits.any(axis=1)
+        self.lifes -= hit
+        rewards[hit] -= self.life_penalty
+        self._respawn(hit)
+
+        dones = self.lifes <= 0
+        if self.max_frames is not None:
+            dones |= self.frames >= self.max_frames
+        if dones.any():
+            self.reset(dones)
+        return self._observe(), rewards, dones
+
+    def _observe(self) -> np.ndarray:
+        """Writes the observations of all envs into the preallocated array."""
+        observations = self._observations
+        observations[:, 0] = self.ship_position[0] / self._width
+        observations[:, 1] = self.ship_position[1] / self._height
+        observations[:, 2:4] = self.ship_velocity.T / 10
+        observations[:, 4:6] = self._units[:, self.heading].T
+        observations[:, 6] = self.lifes
+        rocks = observations[:, BatchedEnv.SHIP_FEATURES :].reshape(self.num_envs, BatchedEnv.ROCK_FEATURES, self.max_rocks)
+        alive = self.rock_radius > 0
+        dx, dy = self.rock_position - self.ship_position[:, :, None]
+        self._torus.minimal(dx, dy)
+        np.multiply(dx, alive / self._width, out=rocks[:, 0])
+        np.multiply(dy, alive / self._height, out=rocks[:, 1])
+        np.multiply(self.rock_velocity[0], alive / 10, out=rocks[:, 2])
+        np.multiply(self.rock_velocity[1], alive / 10, out=rocks[:, 3])
+        np.divide(self.rock_radius, 32, out=rocks[:, 4])
+        rocks[:, 5] = alive
+        return observations
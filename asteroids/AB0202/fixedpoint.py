@@ -0,0 +1,46 @@
+"""Sub-pixel fixed-point numbers for positions and velocities.
+
+A value is stored as integer in units of 1/ONE pixel. Integer additions neither drift nor
+depend on the floating point unit of the machine, and unlike Rect.move_ip no fraction of a
+speed is lost: the fractions accumulate until they make up a whole pixel.
+"""
+import numpy as np
+
+SHIFT = 8  # number of fractional bits
+ONE = 1 << SHIFT  # one pixel
+
+
+def to_fixed(value: float) -> int:
+    """Converts pixels into sub-pixels, rounded to the nearest sub-pixel.
+
+    Args:
+        value (float): value in pixels
+
+    Returns:
+        int: value in sub-pixels
+    """
+    return round(value * ONE)
+
+
+def to_float(value: int) -> float:
+    """Converts sub-pixels into pixels without rounding.
+
+    Args:
+        value (int): value in sub-pixels
+
+    Returns:
+        float: value in pixels
+    """
+    return value / ONE
+
+
+def to_fixed_array(values: np.ndarray) -> np.ndarray:
+    """Vectorized to_fixed.
+
+    Args:
+        values (np.ndarray): values in pixels
+
+    Returns:
+        np.ndarray: values in sub-pixels as int64
+    """
+    return np.rint(np.asarray(values, dtype=np.float64) * ONE).astype(np.int64)
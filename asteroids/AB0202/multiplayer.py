@@ -0,0 +1,585 @@
+"""Multiplayer mode: an authoritative headless server and rendering clients on localhost.
+
+The server simulates all ships and rocks at a fixed tick. Clients send their inputs and receive
+binary snapshots which are delta-compressed against the last snapshot they acknowledged.
+Other entities are interpolated between snapshots; the own ship is predicted from the inputs
+which the server has not yet processed.
+
+Usage:
+    python multiplayer.py server [--port PORT] [--seed SEED]
+    python multiplayer.py client [--host HOST] [--port PORT]
+"""
+import argparse
+import asyncio
+import os
+import struct
+from collections import OrderedDict
+from typing import Optional
+
+import pygame
+from pygame.constants import K_ESCAPE, K_LEFT, K_RIGHT, K_SPACE, K_UP, KEYDOWN, QUIT, VIDEORESIZE
+
+from asteroids import KIND_BULLET, KIND_ROCK, KIND_SHIP, Game, Settings, Ship
+from renderqueue import RenderQueue
+from rendertarget import RenderTarget
+
+FIELDS = 5  # every entity is described by five integers (see ServerGame.entities)
+HISTORY = 64  # number of snapshots kept as possible baselines
+NO_BASELINE = 0xFFFFFFFF
+
+MSG_WELCOME, MSG_INPUT, MSG_SNAPSHOT = 1, 2, 3
+FRAME = struct.Struct("<HB")  # length of the payload, message type
+WELCOME = struct.Struct("<HI")  # player id, tick
+INPUT = struct.Struct("<IIbB")  # input sequence, acknowledged tick, rotation, flags
+SNAPSHOT = struct.Struct("<III")  # tick, baseline tick, last processed input sequence
+FLAG_THRUST, FLAG_FIRE = 1, 2
+
+Entities = dict[int, tuple[int, ...]]
+
+
+def entity_key(kind: int, number: int) -> int:
+    """Network id of an entity: kind in the upper two bits, number in the lower 14 bits."""
+    return kind << 14 | number & 0x3FFF
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    value = value << 1 if value >= 0 else (-value << 1) - 1  # zigzag: small magnitudes use few bytes
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1 if not value & 1 else -((value + 1) >> 1)), offset
+
+
+def encode_snapshot(tick: int, sequence: int, entities: Entities, baseline_tick: int = NO_BASELINE, baseline: Optional[Entities] = None) -> bytes:
+    """Encodes the differences between a baseline and the current entities.
+
+    Only entities which have changed are written; of those only the changed fields, each as
+    zigzag varint of the difference to the baseline. Removed entities are listed by id.
+
+    Args:
+        tick (int): tick of the snapshot
+        sequence (int): last input sequence of the receiving client processed by the server
+        entities (Entities): network id -> FIELDS integers
+        baseline_tick (int, optional): tick of the baseline. Defaults to NO_BASELINE.
+        baseline (Entities, optional): entities acknowledged by the client. Defaults to None.
+
+    Returns:
+        bytes: payload of a MSG_SNAPSHOT
+    """
+    baseline = baseline if baseline is not None else {}
+    buffer = bytearray(SNAPSHOT.pack(tick, baseline_tick if baseline else NO_BASELINE, sequence))
+    changed = [(key, values) for key, values in entities.items() if baseline.get(key) != values]
+    removed = [key for key in baseline if key not in entities]
+    _write_varint(buffer, len(changed))
+    for key, values in changed:
+        old = baseline.get(key, (0,) * FIELDS)
+        mask = 0
+        for index in range(FIELDS):
+            if values[index] != old[index]:
+                mask |= 1 << index
+        _write_varint(buffer, key)
+        buffer.append(mask)
+        for index in range(FIELDS):
+            if mask & 1 << index:
+                _write_varint(buffer, values[index] - old[index])
+    _write_varint(buffer, len(removed))
+    for key in removed:
+        _write_varint(buffer, key)
+    return bytes(buffer)
+
+
+def decode_snapshot(data: bytes, baselines: dict[int, Entities]) -> tuple[int, int, Entities]:
+    """Reconstructs the entities of a snapshot.
+
+    Args:
+        data (bytes): payload of a MSG_SNAPSHOT
+        baselines (dict[int, Entities]): earlier snapshots by tick
+
+    Raises:
+        KeyError: if the baseline of the snapshot is unknown
+
+    Returns:
+        tuple[int, int, Entities]: tick, last processed input sequence, entities
+    """
+    tick, baseline_tick, sequence = SNAPSHOT.unpack_from(data)
+    baseline = baselines[baseline_tick] if baseline_tick != NO_BASELINE else {}
+    entities = dict(baseline)
+    offset = SNAPSHOT.size
+    count, offset = _read_varint(data, offset)
+    for _ in range(count):
+        key, offset = _read_varint(data, offset)
+        mask = data[offset]
+        offset += 1
+        values = list(baseline.get(key, (0,) * FIELDS))
+        for index in range(FIELDS):
+            if mask & 1 << index:
+                delta, offset = _read_varint(data, offset)
+                values[index] += delta
+        entities[key] = tuple(values)
+    count, offset = _read_varint(data, offset)
+    for _ in range(count):
+        key, offset = _read_varint(data, offset)
+        entities.pop(key, None)
+    return tick, sequence, entities
+
+
+class Player:
+    """State of a connected player on the server."""
+
+    def __init__(self, ship: Ship, timer_bullet) -> None:
+        self.ship = ship
+        self.timer_bullet = timer_bullet
+        self.lifes = Settings.lifes
+        self.rotation = 0  # rotation steps received but not yet applied
+        self.thrust = False
+        self.fire = False
+        self.sequence = 0  # last received input sequence
+        self.acknowledged = NO_BASELINE  # last snapshot tick acknowledged by the client
+
+
+class ServerGame(Game):
+    """Headless game with any number of ships, driven by network inputs instead of the keyboard."""
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        """Constructor
+
+        Args:
+            seed (int, optional): Seed of the random number generator; None = random seed. Defaults to None.
+        """
+        super().__init__(headless=True, seed=seed)
+        self._ship._timer_acc.cancel()
+        self._ship.kill()
+        self._players: dict[int, Player] = {}
+        self._next_player = 0
+        self._net_ids: dict[pygame.sprite.Sprite, int] = {}
+
+    def add_player(self) -> int:
+        """Creates a ship for a new player; every player adds Settings.max_bullets to the bullet pool.
+
+        Returns:
+            int: id of the player
+        """
+        player_id = self._next_player
+        self._next_player += 1
+        ship = Ship(self.world, self._scheduler)
+        self._players[player_id] = Player(ship, self._scheduler.timer(Settings.bullet_intervall))
+        self._bullets.reserve(len(self._players) * Settings.max_bullets)
+        self._respawn(ship)
+        return player_id
+
+    def _respawn(self, ship: Ship) -> None:
+        """Places a ship motionless in a free cell, away from the rocks and from the other ships.
+
+        The other ships keep Settings.spawn_safe_radius free; if that leaves no cell, e.g. with
+        many players, the ship only avoids touching rocks and ships.
+
+        Args:
+            ship (Ship): ship of a player
+        """
+        grid = self._spawn_grid
+        others = [player.ship.rect.center for player in self._players.values() if player.ship is not ship and player.lifes > 0]
+        position = None
+        for radius in (Settings.spawn_safe_radius, 0):
+            grid.clear()
+            occupied = self.world.of_kind(KIND_ROCK) | self.world.of_kind(KIND_SHIP)
+            occupied[ship.entity] = False
+            grid.mark_rects(self.world.toplefts()[occupied], self.world.sizes[occupied])
+            if radius > 0:
+                for center in others:
+                    grid.mark_circle(center, radius)
+            position = grid.sample(self._random, ship.rect.size)
+            if position is not None:
+                break
+        ship.respawn(None if position is None else (position[0] + ship.rect.width // 2, position[1] + ship.rect.height // 2))
+
+    def remove_player(self, player_id: int) -> None:
+        """Removes the ship of a disconnected player.
+
+        Args:
+            player_id (int): id of the player
+        """
+        player = self._players.pop(player_id, None)
+        if player is not None:
+            player.timer_bullet.cancel()
+            player.ship._timer_acc.cancel()
+            player.ship.kill()
+
+    def get_player(self, player_id: int) -> Player:
+        return self._players[player_id]
+
+    def set_input(self, player_id: int, sequence: int, rotation: int, flags: int) -> None:
+        """Stores an input of a player; it is applied at the next tick.
+
+        Args:
+            player_id (int): id of the player
+            sequence (int): sequence number of the input
+            rotation (int): -1 = rotate right, 0 = no rotation, +1 = rotate left
+            flags (int): combination of FLAG_THRUST and FLAG_FIRE
+        """
+        player = self._players.get(player_id)
+        if player is not None and sequence > player.sequence:
+            player.sequence = sequence
+            player.rotation += rotation
+            player.thrust = bool(flags & FLAG_THRUST)
+            player.fire = bool(flags & FLAG_FIRE)
+
+    def update(self) -> None:
+        """Applies the inputs of all players and moves ships, bullets and rocks."""
+        ships = [player.ship for player in self._players.values() if player.lifes > 0]
+        if self._timer_rock.is_next_stop_reached():
+            self._spawn_rock(ships)
+        for player in self._players.values():
+            if player.lifes <= 0:
+                continue
+            ship = player.ship
+            while player.rotation:
+                step = 1 if player.rotation > 0 else -1
+                ship.rotate(step)
+                player.rotation -= step
+            if player.thrust != (ship._mode == 1):
+                ship.set_mode(1 if player.thrust else 0)
+            ship.accelerate()
+            if player.fire and player.timer_bullet.is_next_stop_reached():
+                self._bullets.fire(ship)
+        self._run_systems()
+        self._rock_hash.rebuild(self._all_rocks)
+        self._check_bullet_hits()
+        for player in self._players.values():
+            if player.lifes > 0 and self._check_ship_hit(player.ship):
+                player.lifes -= 1
+                if player.lifes > 0:
+                    self._respawn(player.ship)
+                else:
+                    player.ship.kill()  # the ship leaves the world; the player stays connected as spectator
+
+    def _net_id(self, sprite: pygame.sprite.Sprite) -> int:
+        """Stable number of a pooled sprite; pools reuse their sprites, so the numbers stay small."""
+        number = self._net_ids.get(sprite)
+        if number is None:
+            number = len(self._net_ids)
+            self._net_ids[sprite] = number
+        return number
+
+    def entities(self) -> Entities:
+        """Network state of all entities.
+
+        Ship: center x, center y, sprite index | mode << 4 | lifes << 5, 16 * speed x, 16 * speed y
+        Rock: left, top, sprite index, 0, 0
+        Bullet: left, top, 0, 0, 0
+
+        Returns:
+            Entities: network id -> FIELDS integers
+        """
+        entities: Entities = {}
+        for player_id, player in self._players.items():
+            if player.lifes > 0:
+                ship = player.ship
+                frame = ship.imageindex | ship._mode << 4 | player.lifes << 5
+                entities[entity_key(KIND_SHIP, player_id)] = (
+                    *ship.rect.center,
+                    frame,
+                    round(16 * ship.speed_x),
+                    round(16 * ship.speed_y),
+                )
+        for rock in self._all_rocks:
+            entities[entity_key(KIND_ROCK, self._net_id(rock))] = (*rock.rect.topleft, rock.index, 0, 0)
+        for bullet in self._bullets.active:
+            entities[entity_key(KIND_BULLET, self._net_id(bullet))] = (*bullet.rect.topleft, 0, 0, 0)
+        return entities
+
+
+def _frame(kind: int, payload: bytes) -> bytes:
+    return FRAME.pack(len(payload), kind) + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return kind, await reader.readexactly(length)
+
+
+class GameServer:
+    """Runs a ServerGame at a fixed tick and serves its snapshots over TCP."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 5657, seed: Optional[int] = None, tickrate: int = Settings.fps) -> None:
+        """Constructor
+
+        Args:
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): TCP port. Defaults to 5657.
+            seed (int, optional): seed of the game. Defaults to None.
+            tickrate (int, optional): simulation steps per second. Defaults to Settings.fps.
+        """
+        self._host = host
+        self._port = port
+        self._tickrate = tickrate
+        self.game = ServerGame(seed)
+        self.tick = 0
+        self._clients: dict[int, asyncio.StreamWriter] = {}
+        self._history: OrderedDict[int, Entities] = OrderedDict()
+        self.bytes_sent = 0
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        player_id = self.game.add_player()
+        self._clients[player_id] = writer
+        writer.write(_frame(MSG_WELCOME, WELCOME.pack(player_id, self.tick)))
+        try:
+            while True:
+                kind, payload = await _read_frame(reader)
+                if kind == MSG_INPUT:
+                    sequence, acknowledged, rotation, flags = INPUT.unpack(payload)
+                    self.game.set_input(player_id, sequence, rotation, flags)
+                    player = self.game.get_player(player_id)
+                    if acknowledged != NO_BASELINE and (player.acknowledged == NO_BASELINE or acknowledged > player.acknowledged):
+                        player.acknowledged = acknowledged
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._clients[player_id]
+            self.game.remove_player(player_id)
+            writer.close()
+
+    def _broadcast(self) -> None:
+        """Sends every client the delta to the last snapshot it has acknowledged."""
+        entities = self.game.entities()
+        self._history[self.tick] = entities
+        while len(self._history) > HISTORY:
+            self._history.popitem(last=False)
+        for player_id, writer in self._clients.items():
+            if writer.transport.get_write_buffer_size() > 65536:
+                continue  # the client does not keep up; it gets the next snapshot
+            player = self.game.get_player(player_id)
+            baseline = self._history.get(player.acknowledged)
+            payload = encode_snapshot(
+                self.tick, player.sequence, entities, player.acknowledged if baseline is not None else NO_BASELINE, baseline
+            )
+            writer.write(_frame(MSG_SNAPSHOT, payload))
+            self.bytes_sent += len(payload)
+
+    async def serve(self, ticks: Optional[int] = None) -> None:
+        """Accepts clients and simulates the game.
+
+        Args:
+            ticks (int, optional): number of ticks after which the server stops; None = forever. Defaults to None.
+        """
+        server = await asyncio.start_server(self._handle_client, self._host, self._port)
+        loop = asyncio.get_running_loop()
+        interval = 1 / self._tickrate
+        deadline = loop.time()
+        async with server:
+            while ticks is None or self.tick < ticks:
+                self.game.step()
+                self.tick += 1
+                self._broadcast()
+                deadline += interval
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+            for writer in list(self._clients.values()):
+                writer.close()
+            await asyncio.sleep(0)  # lets the handlers of the clients finish
+
+
+class GameClient:
+    """Connection to a GameServer with snapshot buffer, interpolation and prediction of the own ship."""
+
+    def __init__(self, interpolation_delay: int = 2) -> None:
+        """Constructor
+
+        Args:
+            interpolation_delay (int, optional): number of ticks the shown state lags behind the newest snapshot. Defaults to 2.
+        """
+        self._delay = interpolation_delay
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._snapshots: OrderedDict[int, Entities] = OrderedDict()
+        self._received_at = 0.0
+        self._pending: list[tuple[int, int, int]] = []  # inputs not yet processed by the server
+        self._sequence = 0
+        self.player_id = -1
+        self.latest_tick = NO_BASELINE
+
+    async def connect(self, host: str = "127.0.0.1", port: int = 5657) -> None:
+        """Connects and waits for the welcome message of the server."""
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        kind, payload = await _read_frame(self._reader)
+        if kind != MSG_WELCOME:
+            raise ConnectionError("unexpected message from server")
+        self.player_id, _ = WELCOME.unpack(payload)
+
+    async def receive(self) -> None:
+        """Receives snapshots until the connection is closed."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                kind, payload = await _read_frame(self._reader)
+                if kind != MSG_SNAPSHOT:
+                    continue
+                tick, sequence, entities = decode_snapshot(payload, self._snapshots)
+                self._snapshots[tick] = entities
+                while len(self._snapshots) > HISTORY:
+                    self._snapshots.popitem(last=False)
+                self.latest_tick = tick
+                self._received_at = loop.time()
+                self._pending = [entry for entry in self._pending if entry[0] > sequence]
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def send_input(self, rotation: int, thrust: bool, fire: bool) -> None:
+        """Sends the input of one tick and remembers it for the prediction.
+
+        Args:
+            rotation (int): -1 = rotate right, 0 = no rotation, +1 = rotate left
+            thrust (bool): True = accelerate
+            fire (bool): True = fire
+        """
+        self._sequence += 1
+        flags = (FLAG_THRUST if thrust else 0) | (FLAG_FIRE if fire else 0)
+        self._pending.append((self._sequence, rotation, flags))
+        self._writer.write(_frame(MSG_INPUT, INPUT.pack(self._sequence, self.latest_tick, rotation, flags)))
+
+    def interpolated(self, now: float, tickrate: int = Settings.fps) -> Entities:
+        """Entities at the current render time, interpolated between the two surrounding snapshots.
+
+        Positions are interpolated along the shortest way on the torus, so entities which
+        wrapped around an edge between the snapshots move on smoothly.
+
+        Args:
+            now (float): current time of the event loop in seconds
+            tickrate (int, optional): ticks per second of the server. Defaults to Settings.fps.
+
+        Returns:
+            Entities: network id -> FIELDS integers
+        """
+        if not self._snapshots:
+            return {}
+        target = self.latest_tick - self._delay + min(1.0, (now - self._received_at) * tickrate)
+        older = max((tick for tick in self._snapshots if tick <= target), default=None)
+        newer = min((tick for tick in self._snapshots if tick > target), default=None)
+        if older is None or newer is None:
+            return self._snapshots[self.latest_tick if older is None else older]
+        factor = (target - older) / (newer - older)
+        result = {}
+        for key, values in self._snapshots[newer].items():
+            previous = self._snapshots[older].get(key)
+            if previous is None:
+                result[key] = values
+            else:
+                dx, dy = Settings.torus.minimal(values[0] - previous[0], values[1] - previous[1])
+                x, y = Settings.torus.wrap(round(previous[0] + factor * dx), round(previous[1] + factor * dy))
+                result[key] = (x, y, *values[2:])
+        return result
+
+    def predicted_ship(self) -> Optional[tuple[int, ...]]:
+        """Own ship of the newest snapshot advanced by the inputs the server has not yet processed.
+
+        The thrust is approximated by a constant acceleration; the next snapshot corrects it.
+
+        Returns:
+            Optional[tuple[int, ...]]: entity values of the own ship; None if it is not in the game
+        """
+        if self.latest_tick == NO_BASELINE:
+            return None
+        state = self._snapshots[self.latest_tick].get(entity_key(KIND_SHIP, self.player_id))
+        if state is None:
+            return None
+        x, y, frame, speed_x, speed_y = state
+        index, rest = frame & 0xF, frame & ~0x1F
+        mode = frame >> 4 & 1
+        x, y, speed_x, speed_y = float(x), float(y), speed_x / 16, speed_y / 16
+        acceleration = Settings.timestep / 100  # the ship accelerates by 1 every 100 ms
+        for _, rotation, flags in self._pending:
+            index = (index + rotation) % len(Settings.headings)
+            mode = 1 if flags & FLAG_THRUST else 0
+            if mode:
+                sine, cosine = Settings.headings.vector(index)
+                new_x, new_y = speed_x - acceleration * sine, speed_y - acceleration * cosine
+                if abs(new_x) < 10 and abs(new_y) < 10:
+                    speed_x, speed_y = new_x, new_y
+            x, y = Settings.torus.wrap(x + speed_x, y + speed_y)
+        return (round(x), round(y), rest | mode << 4 | index, round(16 * speed_x), round(16 * speed_y))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+async def run_client(host: str, port: int) -> None:
+    """Window of a player: keyboard input, interpolated rocks and ships, predicted own ship."""
+    os.environ["SDL_VIDEO_WINDOW_POS"] = "10, 30"
+    pygame.init()
+    target = RenderTarget(Settings.get_dim(), Settings.display, pygame.RESIZABLE, Settings.integer_coverage)
+    pygame.display.set_caption(Settings.caption)
+    container = Game.load_sprites()
+    ships = (container.get_frames("ships_flying"), container.get_frames("ships_acc"))
+    rocks = container.get_frames("rocks")
+    bullet = container.get_frames("bullets")[Settings.bullet_index].image
+    queue = RenderQueue()
+    client = GameClient()
+    await client.connect(host, port)
+    receiver = asyncio.create_task(client.receive())
+    loop = asyncio.get_running_loop()
+    running = True
+    while running and not receiver.done():
+        rotation = 0
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                running = False
+            elif event.type == KEYDOWN and event.key in (K_LEFT, K_RIGHT):
+                rotation += 1 if event.key == K_LEFT else -1
+            elif event.type == VIDEORESIZE:
+                target.resize(event.size)
+        keys = pygame.key.get_pressed()
+        client.send_input(max(-127, min(127, rotation)), keys[K_UP], keys[K_SPACE])
+        entities = client.interpolated(loop.time())
+        own = client.predicted_ship()
+        if own is not None:
+            entities[entity_key(KIND_SHIP, client.player_id)] = own
+        screen = target.surface
+        screen.fill((0, 0, 0))
+        for key, (x, y, a, _, _) in entities.items():
+            kind = key >> 14
+            if kind == KIND_SHIP:
+                image, layer = ships[a >> 4 & 1][a & 0xF].image, Settings.layers["ships"]
+                rect = image.get_rect(center=(x, y))
+            elif kind == KIND_ROCK:
+                image, layer = rocks[a].image, Settings.layers["rocks"]
+                rect = pygame.Rect((x, y), image.get_size())
+            else:
+                image, layer = bullet, Settings.layers["bullets"]
+                rect = pygame.Rect((x, y), image.get_size())
+            queue.add(image, rect, layer)
+            for ghost in Settings.torus.ghost_rects(rect):
+                queue.add(image, ghost, layer)
+        queue.flush(screen)
+        target.present()
+        await asyncio.sleep(1 / Settings.fps)
+    client.close()
+    receiver.cancel()
+    pygame.quit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Multiplayer " + Settings.caption)
+    parser.add_argument("role", choices=("server", "client"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5657)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.role == "server":
+        asyncio.run(GameServer(args.host, args.port, args.seed).serve())
+    else:
+        asyncio.run(run_client(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,62 @@
+import hashlib
+import heapq
+import itertools
 import json
-from typing import Tuple
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, Tuple
 
 import pygame
 
 
+class SimulationClock:
+    """Simulated game time which is advanced in fixed steps instead of following the wall-clock."""
+
+    def __init__(self, start: float = 0) -> None:
+        """Constructor
+
+        Args:
+            start (float, optional): Start time in milli seconds. Defaults to 0.
+        """
+        self._ticks = start
+
+    def get_ticks(self) -> int:
+        """Current simulation time, analogous to pygame.time.get_ticks().
+
+        Returns:
+            int: milli seconds since the start of the simulation
+        """
+        return int(self._ticks)
+
+    def advance(self, milliseconds: float) -> None:
+        """Moves the simulation time forward.
+
+        Args:
+            milliseconds (float): length of the time step in milli seconds
+        """
+        self._ticks += milliseconds
+
+
 class Timer:
     """Timer in order to check time periodes."""
 
-    def __init__(self, duration: int, with_start: bool = True) -> None:
+    def __init__(self, duration: int, with_start: bool = True, clock: Callable[[], int] = None) -> None:
         """Constructor
 
         Args:
             duration (int): duration of the time interval in milli seconds
             with_start (bool, optional): Controls if the first period will count (True) or not (False). Defaults to True.
+            clock (Callable[[], int], optional): Source of the current time in milli seconds. Defaults to None which means pygame.time.get_ticks.
         """
         self.duration = duration
+        self._get_ticks = clock if clock is not None else pygame.time.get_ticks
         if with_start:
-            self._next = pygame.time.get_ticks()
+            self._next = self._get_ticks()
         else:
-            self._next = pygame.time.get_ticks() + self.duration
+            self._next = self._get_ticks() + self.duration
 
     def is_next_stop_reached(self) -> bool:
         """Checks if the end of a time period is reached or exceeded.
@@ -26,36 +64,409 @@ class Timer:
         Returns:
             bool: True if the end of the period is reached or exceeded; otherwise False
         """
-        if pygame.time.get_ticks() > self._next:
-            self._next = pygame.time.get_ticks() + self.duration
+        now = self._get_ticks()
+        if now > self._next:
+            self._next = now + self.duration
+            return True
+        return False
+
+
+class ScheduledTimer:
+    """Timer which is triggered by a Scheduler instead of polling the clock.
+
+    It offers the same is_next_stop_reached() as Timer, so both can be used interchangeably.
+    """
+
+    def __init__(self, duration: int, periodic: bool, callback: Optional[Callable[[], None]] = None) -> None:
+        """Constructor; use Scheduler.timer() or Scheduler.once() instead.
+
+        Args:
+            duration (int): duration of the time interval in milli seconds
+            periodic (bool): True = the timer restarts after each period; False = one-shot timer
+            callback (Callable[[], None], optional): called when the period ends. Defaults to None.
+        """
+        self.duration = duration
+        self.periodic = periodic
+        self.callback = callback
+        self.ready = False
+        self.active = True
+
+    def is_next_stop_reached(self) -> bool:
+        """Checks if the end of a time period has been reached since the last check.
+
+        Returns:
+            bool: True if the end of the period is reached or exceeded; otherwise False
+        """
+        if self.ready:
+            self.ready = False
             return True
         return False
 
+    def cancel(self) -> None:
+        """Stops the timer; it is removed from the scheduler at its next deadline."""
+        self.active = False
+
+
+class Scheduler:
+    """Central min-heap of timer deadlines which is advanced once per tick.
+
+    Only timers whose deadline has passed are touched, so the costs per tick do not depend on
+    the number of waiting timers. The scheduler can be paused and its time can be scaled.
+    """
+
+    def __init__(self, clock: Optional[SimulationClock] = None) -> None:
+        """Constructor
+
+        Args:
+            clock (SimulationClock, optional): time of the scheduler; None = a new clock starting at 0. Defaults to None.
+        """
+        self._clock = clock if clock is not None else SimulationClock()
+        self._heap: list[tuple[int, int, ScheduledTimer]] = []
+        self._sequence = itertools.count()  # keeps timers with the same deadline in order of scheduling
+        self.paused = False
+        self.scale = 1.0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def get_ticks(self) -> int:
+        """Current time of the scheduler, analogous to pygame.time.get_ticks().
+
+        Returns:
+            int: milli seconds
+        """
+        return self._clock.get_ticks()
+
+    def _push(self, deadline: int, timer: ScheduledTimer) -> None:
+        heapq.heappush(self._heap, (deadline, next(self._sequence), timer))
+
+    def timer(self, duration: int, with_start: bool = True, callback: Optional[Callable[[], None]] = None) -> ScheduledTimer:
+        """Creates a periodic timer.
+
+        Args:
+            duration (int): duration of the time interval in milli seconds
+            with_start (bool, optional): Controls if the first period will count (True) or not (False). Defaults to True.
+            callback (Callable[[], None], optional): called at the end of each period. Defaults to None.
+
+        Returns:
+            ScheduledTimer: the timer
+        """
+        timer = ScheduledTimer(duration, True, callback)
+        self._push(self.get_ticks() if with_start else self.get_ticks() + duration, timer)
+        return timer
+
+    def once(self, delay: int, callback: Optional[Callable[[], None]] = None) -> ScheduledTimer:
+        """Creates a one-shot timer.
+
+        Args:
+            delay (int): milli seconds until the timer is triggered
+            callback (Callable[[], None], optional): called when the timer is triggered. Defaults to None.
+
+        Returns:
+            ScheduledTimer: the timer
+        """
+        timer = ScheduledTimer(delay, False, callback)
+        self._push(self.get_ticks() + delay, timer)
+        return timer
+
+    def advance(self, milliseconds: float) -> None:
+        """Moves the time forward by milliseconds * scale and triggers all due timers.
+
+        A periodic timer is triggered at most once per call; missed periods are skipped.
+
+        Args:
+            milliseconds (float): length of the tick in milli seconds
+        """
+        if self.paused:
+            return
+        self._clock.advance(milliseconds * self.scale)
+        now = self._clock.get_ticks()
+        heap = self._heap
+        restart = []
+        while heap and heap[0][0] <= now:
+            deadline, _, timer = heapq.heappop(heap)
+            if not timer.active:
+                continue
+            timer.ready = True
+            if timer.periodic:
+                deadline += timer.duration
+                restart.append((deadline if deadline > now else now + timer.duration, timer))
+            else:
+                timer.active = False
+            if timer.callback is not None:
+                timer.callback()
+        for deadline, timer in restart:
+            if timer.active:
+                self._push(deadline, timer)
+
+
+class AssetManager:
+    """Loads images in background threads and caches them per target size.
+
+    Decoding and scaling run in a thread pool; the conversion into the pixel format of the
+    display has to happen in the main thread and is done by poll(), which should be called
+    once per frame. Until an image is ready, get() returns a placeholder.
+    """
+
+    def __init__(self, directory: str, workers: int = 2, placeholder_color: Tuple[int, int, int, int] = (0, 0, 0, 0)) -> None:
+        """Constructor
+
+        Args:
+            directory (str): directory of the image files
+            workers (int, optional): number of decoding threads. Defaults to 2.
+            placeholder_color (Tuple[int, int, int, int], optional): color of the placeholders. Defaults to (0, 0, 0, 0).
+        """
+        self._directory = directory
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self._placeholder_color = placeholder_color
+        self._decoded: dict[str, Future] = {}
+        self._pending: dict[tuple, Future] = {}
+        self._surfaces: dict[tuple, pygame.surface.Surface] = {}
+        self._placeholders: dict[Tuple[int, int], pygame.surface.Surface] = {}
+
+    def _decode(self, filename: str) -> Future:
+        """Starts decoding an image file once.
+
+        Args:
+            filename (str): name of the file in the directory of the manager
+
+        Returns:
+            Future: resolves to the decoded, not yet converted surface
+        """
+        future = self._decoded.get(filename)
+        if future is None:
+            future = self._executor.submit(pygame.image.load, os.path.join(self._directory, filename))
+            self._decoded[filename] = future
+        return future
+
+    @staticmethod
+    def _scale(decoded: Future, size: Tuple[int, int]) -> pygame.surface.Surface:
+        return pygame.transform.scale(decoded.result(), size)
+
+    def request(
+        self, filename: str, colorkey: Tuple[int, int, int] = None, size: Tuple[int, int] = None, alpha: bool = True
+    ) -> None:
+        """Starts loading an image in the background unless it is loaded or requested already.
+
+        Args:
+            filename (str): name of the file in the directory of the manager
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None, which means the transparency of the file.
+            size (Tuple[int, int], optional): target size; None = original size. Defaults to None.
+            alpha (bool, optional): False = an image without colorkey is converted without transparency. Defaults to True.
+        """
+        key = (filename, colorkey, size, alpha)
+        if key in self._surfaces or key in self._pending:
+            return
+        decoded = self._decode(filename)
+        self._pending[key] = decoded if size is None else self._executor.submit(AssetManager._scale, decoded, size)
+
+    def poll(self) -> int:
+        """Converts the images which have been decoded in the meantime; must be called by the main thread.
+
+        Returns:
+            int: number of images which became ready
+        """
+        ready = [key for key, future in self._pending.items() if future.done()]
+        for key in ready:
+            _, colorkey, _, alpha = key
+            image = self._pending.pop(key).result()
+            if colorkey is not None:
+                image = image.convert()
+                image.set_colorkey(colorkey)
+            elif alpha:
+                image = image.convert_alpha()
+            else:
+                image = image.convert()
+            self._surfaces[key] = image
+        return len(ready)
+
+    def wait(self) -> None:
+        """Blocks until all requested images are ready."""
+        for future in list(self._pending.values()):
+            future.result()
+        self.poll()
+
+    def is_ready(
+        self, filename: str, colorkey: Tuple[int, int, int] = None, size: Tuple[int, int] = None, alpha: bool = True
+    ) -> bool:
+        """Checks whether an image is loaded and converted; the arguments are the same as of request().
+
+        Returns:
+            bool: True = get() returns the image itself
+        """
+        return (filename, colorkey, size, alpha) in self._surfaces
+
+    def get(
+        self,
+        filename: str,
+        colorkey: Tuple[int, int, int] = None,
+        size: Tuple[int, int] = None,
+        alpha: bool = True,
+        placeholder: pygame.surface.Surface = None,
+    ) -> pygame.surface.Surface:
+        """Returns an image, requesting it if necessary.
+
+        Args:
+            filename (str): name of the file in the directory of the manager
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None, which means the transparency of the file.
+            size (Tuple[int, int], optional): target size; None = original size. Defaults to None.
+            alpha (bool, optional): False = an image without colorkey is converted without transparency. Defaults to True.
+            placeholder (pygame.surface.Surface, optional): returned while the image is not ready. Defaults to None, which means a surface of the placeholder color.
+
+        Returns:
+            pygame.surface.Surface: the image or a placeholder
+        """
+        image = self._surfaces.get((filename, colorkey, size, alpha))
+        if image is not None:
+            return image
+        self.request(filename, colorkey, size, alpha)
+        if placeholder is not None:
+            return placeholder
+        dimension = size if size is not None else (1, 1)
+        image = self._placeholders.get(dimension)
+        if image is None:
+            image = pygame.Surface(dimension, pygame.SRCALPHA)
+            image.fill(self._placeholder_color)
+            self._placeholders[dimension] = image
+        return image
+
+    def shutdown(self) -> None:
+        """Stops the decoding threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AnimationClip:
+    """Immutable pictures of an animation which are shared by all animations using the same files.
+
+    Clips are reference counted. A clip which is no longer used is kept in a small LRU cache,
+    so an effect which is started again soon does not load its pictures again.
+    """
+
+    cache_size = 16  # number of unused clips which are kept
+    _clips: dict[tuple, "AnimationClip"] = {}
+    _unused: "OrderedDict[tuple, AnimationClip]" = OrderedDict()
+
+    def __init__(
+        self, key: tuple, namelist: tuple[str, ...], colorkey: Tuple[int, int, int] = None, assets: Optional[AssetManager] = None
+    ) -> None:
+        """Constructor; use AnimationClip.acquire() instead.
+
+        Args:
+            key (tuple): key of the clip in the cache
+            namelist (tuple[str, ...]): filenames of the pictures
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None.
+            assets (AssetManager, optional): Loads the pictures in the background. Defaults to None.
+        """
+        self._key = key
+        self._namelist = namelist
+        self._colorkey = colorkey
+        self._assets = assets
+        self._references = 0
+        self._images: tuple[pygame.surface.Surface, ...] = ()  # only without asset manager; frame() asks the manager otherwise
+        if assets is not None:
+            for filename in namelist:
+                assets.request(filename, colorkey)
+            return
+        images = []
+        for filename in namelist:
+            if colorkey == None:
+                bitmap = pygame.image.load(filename).convert_alpha()
+            else:
+                bitmap = pygame.image.load(filename).convert()
+                bitmap.set_colorkey(colorkey)
+            images.append(bitmap)
+        self._images = tuple(images)
+
+    def __len__(self) -> int:
+        return len(self._namelist)
+
+    @property
+    def images(self) -> tuple[pygame.surface.Surface, ...]:
+        """All pictures; placeholders for pictures which are still loading."""
+        return tuple(self.frame(index) for index in range(len(self)))
+
+    def frame(self, index: int) -> pygame.surface.Surface:
+        """A single picture of the clip.
+
+        Args:
+            index (int): index of the picture
+
+        Returns:
+            pygame.surface.Surface: the picture or its placeholder
+        """
+        if self._assets is not None:
+            return self._assets.get(self._namelist[index], self._colorkey)
+        return self._images[index]
+
+    @classmethod
+    def acquire(
+        cls, namelist: list[str], colorkey: Tuple[int, int, int] = None, assets: Optional[AssetManager] = None
+    ) -> "AnimationClip":
+        """Returns the shared clip of the pictures and increments its reference count.
+
+        Args:
+            namelist (list[str]): filenames of the pictures; complete paths if no asset manager is given
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None.
+            assets (AssetManager, optional): Loads the pictures in the background. Defaults to None.
+
+        Returns:
+            AnimationClip: the clip; it has to be given back with release()
+        """
+        key = (tuple(namelist), colorkey, id(assets) if assets is not None else None)
+        clip = cls._clips.get(key)
+        if clip is None:
+            clip = cls._unused.pop(key, None)
+            if clip is None:
+                clip = cls(key, tuple(namelist), colorkey, assets)
+            cls._clips[key] = clip
+        clip._references += 1
+        return clip
+
+    def release(self) -> None:
+        """Decrements the reference count; unused clips are moved into the LRU cache."""
+        self._references -= 1
+        if self._references <= 0 and AnimationClip._clips.get(self._key) is self:
+            del AnimationClip._clips[self._key]
+            AnimationClip._unused[self._key] = self
+            while len(AnimationClip._unused) > AnimationClip.cache_size:
+                AnimationClip._unused.popitem(last=False)
+
 
 class Animation:
-    """This class helps to animate a sprite."""
+    """This class helps to animate a sprite.
 
-    def __init__(self, namelist: list[str], endless: bool, animationtime: int, colorkey: Tuple[int, int, int] = None):
+    It is a lightweight playhead; the pictures are held by a shared AnimationClip.
+    """
+
+    def __init__(
+        self,
+        namelist: list[str],
+        endless: bool,
+        animationtime: int,
+        colorkey: Tuple[int, int, int] = None,
+        scheduler: Optional[Scheduler] = None,
+        assets: Optional[AssetManager] = None,
+    ):
         """Constructor.
 
         Args:
-            namelist (list[str]): List of filenames of the picures of the animation. The order of the filenames is the order of the animation.
+            namelist (list[str]): List of filenames of the picures of the animation. The order of the filenames is the order of the animation. Without an asset manager the filenames have to be complete paths.
             endless (bool): True = animation repeats endless. False = animation stops after the last picture.
             animationtime (int): milliseconds between each picture.
             colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None. If this color is not set, the transparancy must be coded by the picture itself.
+            scheduler (Scheduler, optional): Scheduler which triggers the timer of the animation. Defaults to None which means a polling Timer.
+            assets (AssetManager, optional): Loads the pictures in the background; placeholders are shown until they are ready. Defaults to None which means the pictures are loaded immediately.
         """
-        self.images: list[pygame.surface.Surface] = []
+        self.clip = AnimationClip.acquire(namelist, colorkey, assets)
         self.endless = endless
-        self.timer = Timer(animationtime)
-        for filename in namelist:
-            if colorkey == None:
-                bitmap = pygame.image.load(Settings.imagepath(filename)).convert_alpha()
-            else:
-                bitmap = pygame.image.load(Settings.imagepath(filename)).convert()
-                bitmap.set_colorkey(colorkey)
-            self.images.append(bitmap)
+        self.timer = scheduler.timer(animationtime) if scheduler is not None else Timer(animationtime)
         self.imageindex = -1
 
+    @property
+    def images(self) -> tuple[pygame.surface.Surface, ...]:
+        """All pictures of the animation."""
+        return self.clip.images
+
     def next(self) -> pygame.surface.Surface:
         """Computes the next animation picure.
 
@@ -64,12 +475,12 @@ class Animation:
         """
         if self.timer.is_next_stop_reached():
             self.imageindex += 1
-            if self.imageindex >= len(self.images):
+            if self.imageindex >= len(self.clip):
                 if self.endless:
                     self.imageindex = 0
                 else:
-                    self.imageindex = len(self.images) - 1
-        return self.images[self.imageindex]
+                    self.imageindex = len(self.clip) - 1
+        return self.clip.frame(self.imageindex)
 
     def is_ended(self) -> bool:
         """Checks wether the animation has reached the end or not.
@@ -79,23 +490,229 @@ class Animation:
         """
         if self.endless:
             return False
-        elif self.imageindex >= len(self.images) - 1:
+        elif self.imageindex >= len(self.clip) - 1:
             return True
         else:
             return False
 
+    def release(self) -> None:
+        """Gives the pictures back; the animation must not be used afterwards."""
+        if self.clip is not None:
+            self.clip.release()
+            self.clip = None
+            if isinstance(self.timer, ScheduledTimer):
+                self.timer.cancel()
+
+
+class SpriteFrame(NamedTuple):
+    """Immutable, precomputed data of a single sprite which can be shared by all sprite instances.
+
+    The surface, the mask and the rect must not be modified.
+    """
+
+    image: pygame.surface.Surface
+    mask: pygame.mask.Mask
+    rect: pygame.Rect  # bounding rect of the opaque pixels relative to the image
+
+
+class CompiledAtlas:
+    """Read-only sprite atlas compiled from a json rect file and a sprite sheet.
+
+    The compiled file is memory-mapped; its pixels are used directly by the sprite sheet surface,
+    so all containers of a process share one atlas and the pages are shared between processes.
+    The stored pixel format usually differs from the one of the display, so games which draw
+    take a copy converted once per process (see converted); headless games use the mapped pixels.
+
+    File layout (little endian):
+        header: magic, version, sha256 of the sources, width, height, number of rects
+        rects:  per rect the name of the sprite sequence (utf-8, zero padded), index, left, top, width, height
+        pixels: width * height * 4 bytes in the format BGRA; RGBX for sprite sheets with a colorkey,
+            whose pixels are opaque; a surface with per-pixel alpha and a colorkey blits several times slower
+    """
+
+    MAGIC = b"SPAT"
+    VERSION = 2
+    HEADER = struct.Struct("<4sH32sIII")
+    RECT = struct.Struct("<32sHiiii")
+    FORMAT = "BGRA"
+    FORMAT_COLORKEY = "RGBX"
+
+    _cache: dict[str, "CompiledAtlas"] = {}
+
+    def __init__(self, digest: bytes, image: pygame.surface.Surface, rects: dict[str, dict[int, pygame.Rect]], buffer: Optional[mmap.mmap] = None) -> None:
+        """Constructor
+
+        Args:
+            digest (bytes): sha256 of the sources
+            image (pygame.surface.Surface): sprite sheet
+            rects (dict[str, dict[int, pygame.Rect]]): rects of all sprite sequences
+            buffer (mmap.mmap, optional): memory map which holds the pixels of image. Defaults to None.
+        """
+        self.digest = digest
+        self.image = image
+        self.rects = rects
+        self._buffer = buffer
+        self._converted: Optional[pygame.surface.Surface] = None
+
+    def converted(self) -> pygame.surface.Surface:
+        """The sprite sheet in the pixel format of the display, so blitting it needs no conversion.
+
+        The copy is made once and shared by all containers of the process.
+
+        Returns:
+            pygame.surface.Surface: converted sprite sheet; requires an open display
+        """
+        if self._converted is None:
+            self._converted = self.image.convert() if self.image.get_colorkey() is not None else self.image.convert_alpha()
+        return self._converted
+
+    @staticmethod
+    def source_digest(rectfile: str, spritesheetfile: str, colorkey: Tuple[int, int, int] = None) -> bytes:
+        """Content hash of the sources of an atlas.
+
+        Args:
+            rectfile (str): Name of the json file.
+            spritesheetfile (str): Name of the sprite sheet.
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None.
+
+        Returns:
+            bytes: sha256 digest
+        """
+        digest = hashlib.sha256()
+        for filename in (rectfile, spritesheetfile):
+            with open(filename, "rb") as infile:
+                digest.update(infile.read())
+        digest.update(repr(colorkey).encode())
+        return digest.digest()
+
+    @classmethod
+    def open(cls, filename: str, digest: bytes, colorkey: Tuple[int, int, int] = None) -> Optional["CompiledAtlas"]:
+        """Maps a compiled atlas into memory.
+
+        Args:
+            filename (str): Name of the compiled atlas.
+            digest (bytes): Expected content hash of the sources.
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None.
+
+        Returns:
+            Optional[CompiledAtlas]: the atlas; None if the file is missing, damaged or out of date.
+        """
+        key = os.path.abspath(filename)
+        atlas = cls._cache.get(key)
+        if atlas is not None and atlas.digest == digest:
+            return atlas
+        try:
+            with open(filename, "rb") as infile:
+                buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buffer) < cls.HEADER.size:
+            return None
+        magic, version, stored, width, height, count = cls.HEADER.unpack_from(buffer)
+        offset = cls.HEADER.size + count * cls.RECT.size
+        if (magic, version, stored) != (cls.MAGIC, cls.VERSION, digest) or len(buffer) != offset + 4 * width * height:
+            return None
+        rects: dict[str, dict[int, pygame.Rect]] = {}
+        for name, index, left, top, rectwidth, rectheight in cls.RECT.iter_unpack(buffer[cls.HEADER.size : offset]):
+            rects.setdefault(name.rstrip(b"\0").decode(), {})[index] = pygame.Rect(left, top, rectwidth, rectheight)
+        image = pygame.image.frombuffer(
+            memoryview(buffer)[offset:], (width, height), cls.FORMAT if colorkey is None else cls.FORMAT_COLORKEY
+        )
+        if colorkey is not None:
+            image.set_colorkey(colorkey)
+        atlas = cls(digest, image, rects, buffer)
+        cls._cache[key] = atlas
+        return atlas
+
+    @classmethod
+    def compile(cls, filename: str, digest: bytes, image: pygame.surface.Surface, rects: dict[str, dict[int, pygame.Rect]]) -> None:
+        """Writes a compiled atlas.
+
+        The file is written to a temporary file first and then renamed, so a running game never
+        maps a half written atlas.
+
+        Args:
+            filename (str): Name of the compiled atlas.
+            digest (bytes): Content hash of the sources.
+            image (pygame.surface.Surface): converted sprite sheet
+            rects (dict[str, dict[int, pygame.Rect]]): rects of all sprite sequences
+        """
+        table = [
+            cls.RECT.pack(name.encode(), index, *rect)
+            for name, sequence in rects.items()
+            for index, rect in sequence.items()
+        ]
+        tempname = f"{filename}.{os.getpid()}.tmp"
+        with open(tempname, "wb") as outfile:
+            outfile.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, digest, *image.get_size(), len(table)))
+            outfile.write(b"".join(table))
+            outfile.write(pygame.image.tobytes(image, cls.FORMAT if image.get_colorkey() is None else cls.FORMAT_COLORKEY))
+        os.replace(tempname, filename)
+
 
 class SpriteContainer:
-    def __init__(self, rectfile: str, spritesheetfile: str, colorkey: Tuple[int, int, int] = None) -> None:
-        self._spritesheed = pygame.image.load(spritesheetfile).convert()
-        if colorkey == None:
-            self._spritesheed = self._spritesheed.convert_alpha()
-        else:
-            self._spritesheed = self._spritesheed.convert()
-            self._spritesheed.set_colorkey(colorkey)
+    def __init__(
+        self,
+        rectfile: str,
+        spritesheetfile: str,
+        colorkey: Tuple[int, int, int] = None,
+        atlasfile: str = None,
+        digest: bytes = None,
+        convert: bool = True,
+    ) -> None:
+        """Constructor
+
+        Args:
+            rectfile (str): Name of the json file which defines the sprites.
+            spritesheetfile (str): Name of the sprite sheet.
+            colorkey (Tuple[int, int, int], optional): Transparent color. Defaults to None. If this color is not set, the transparancy must be coded by the sprite sheet itself.
+            atlasfile (str, optional): Name of a compiled atlas. If it is up to date, it is used instead of the json file and the sprite sheet; otherwise it is (re)compiled. Defaults to None.
+            digest (bytes, optional): Content hash of the sources, e.g. computed once by a parent process; None = the sources are hashed. Defaults to None.
+            convert (bool, optional): True = the sprites of a compiled atlas are converted into the pixel format of the display; False = they stay in the memory-mapped file, e.g. for headless games. Defaults to True.
+        """
         self._rects: dict[str, dict[int, pygame.Rect]] = {}
         self._sprites: dict[str, dict[int, pygame.surface.Surface]] = {}
-        self._load(rectfile)
+        self._frames: dict[str, tuple[SpriteFrame, ...]] = {}
+        atlas = None
+        if atlasfile is not None:
+            if digest is None:
+                digest = CompiledAtlas.source_digest(rectfile, spritesheetfile, colorkey)
+            atlas = CompiledAtlas.open(atlasfile, digest, colorkey)
+        if atlas is not None:
+            self._spritesheed = atlas.converted() if convert else atlas.image
+            self._rects = atlas.rects
+        else:
+            self._spritesheed = pygame.image.load(spritesheetfile)
+            if colorkey == None:
+                self._spritesheed = self._spritesheed.convert_alpha()
+            else:
+                self._spritesheed = self._spritesheed.convert()
+                self._spritesheed.set_colorkey(colorkey)
+            self._load(rectfile)
+            if atlasfile is not None:
+                try:
+                    CompiledAtlas.compile(atlasfile, digest, self._spritesheed, self._rects)
+                except OSError:
+                    pass  # without a compiled atlas the sources are loaded the next time again
+        for spritename, rects in self._rects.items():
+            self._sprites[spritename] = {index: self._spritesheed.subsurface(rect) for index, rect in rects.items()}
+        for key, sprites in self._sprites.items():
+            self._frames[key] = tuple(self._create_frame(sprites[index]) for index in sorted(sprites))
+
+    @staticmethod
+    def _create_frame(image: pygame.surface.Surface) -> SpriteFrame:
+        """Computes mask and bounding rect of a sprite.
+
+        Args:
+            image (pygame.surface.Surface): sprite
+
+        Returns:
+            SpriteFrame: cache entry of the sprite
+        """
+        mask = pygame.mask.from_surface(image)
+        bounds = mask.get_bounding_rects()
+        rect = bounds[0].unionall(bounds[1:]) if bounds else pygame.Rect(0, 0, 0, 0)
+        return SpriteFrame(image, mask, rect)
 
     def _load(self, filename: str) -> None:
         """Loads the json-file which defines the sprites in a spritesheet.
@@ -113,15 +730,11 @@ class SpriteContainer:
             data = json.load(infile)
             for spritename in data.items():
                 self._rects[spritename[0]] = {}
-                self._sprites[spritename[0]] = {}
                 for rectdata in spritename[1].items():
                     index = int(rectdata[0])
                     self._rects[spritename[0]][index] = pygame.Rect(
                         rectdata[1][0], rectdata[1][1], rectdata[1][2], rectdata[1][3]
                     )
-                    self._sprites[spritename[0]][index] = self._spritesheed.subsurface(
-                        self._rects[spritename[0]][index]
-                    )
 
     def get_sprites(self, key: str) -> dict[int, pygame.surface.Surface]:
         """Returns a sprite sequence.
@@ -133,3 +746,16 @@ class SpriteContainer:
             dict[int, pygame.surface.Surface]: sprite sequence
         """
         return self._sprites[key]
+
+    def get_frames(self, key: str) -> tuple[SpriteFrame, ...]:
+        """Returns the precomputed frames of a sprite sequence.
+
+        The frames are computed once while loading and are shared by all callers.
+
+        Args:
+            key (str): Name of the sprite sequence
+
+        Returns:
+            tuple[SpriteFrame, ...]: frames in the order of their indices
+        """
+        return self._frames[key]
@@ -0,0 +1,169 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pygame
+
+from torus import Torus
+
+
+SHADES = 32  # brightness levels of the fading particles
+
+
+class ParticleSystem:
+    """Short-lived points, e.g. exhaust and debris, stored in a ring buffer of NumPy arrays.
+
+    A particle is no sprite: position, velocity, age, lifetime and color of all particles are
+    columns of preallocated arrays, which are integrated and drawn in bulk. New particles
+    overwrite the oldest ones when the buffer is full, so emitting never allocates and the
+    cost of a step does not depend on the history of the game.
+
+    Particles are drawn as single pixels which fade out with their age. Colors are stored as
+    index into a small palette, whose shades are converted once into the pixel format of the
+    target. For dirty rendering the covered cells of a coarse grid are returned as update rects.
+    """
+
+    def __init__(
+        self,
+        playground: pygame.Rect,
+        capacity: int = 65536,
+        drag: float = 0.98,
+        cell_size: int = 64,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            playground (pygame.Rect): Area in which the particles are wrapped around.
+            capacity (int, optional): Maximum number of live particles. Defaults to 65536.
+            drag (float, optional): Factor applied to the velocities in every step. Defaults to 0.98.
+            cell_size (int, optional): Width and height of the cells returned as update rects. Defaults to 64.
+            seed (int, optional): Seed of the random directions and speeds; None = random seed. Defaults to None.
+        """
+        self._torus = Torus(playground)
+        self._playground = playground
+        self._capacity = capacity
+        self._drag = np.float32(drag)
+        self._rng = np.random.default_rng(seed)
+        self._head = 0  # next slot to overwrite
+        self._remaining = 0  # steps until all particles are dead
+        self._positions = np.zeros((2, capacity), dtype=np.float32)  # coordinates first: x and y are contiguous rows
+        self._velocities = np.zeros((2, capacity), dtype=np.float32)
+        self._ages = np.zeros(capacity, dtype=np.float32)
+        self._lifetimes = np.zeros(capacity, dtype=np.float32)  # 0 = free slot
+        self._colors = np.zeros(capacity, dtype=np.uint8)  # index in the palette
+        self._palette: dict[Tuple[int, int, int], int] = {}
+        self._shades: Optional[np.ndarray] = None  # mapped colors; shape (palette, SHADES)
+        self._format: Optional[tuple] = None  # pixel format the shades are mapped to
+        self._cell_size = cell_size
+
+    def __len__(self) -> int:
+        """Number of live particles."""
+        if self._remaining == 0:
+            return 0
+        return int(np.count_nonzero(self._ages < self._lifetimes))
+
+    def emit(
+        self,
+        position: Tuple[float, float],
+        count: int,
+        velocity: Tuple[float, float] = (0.0, 0.0),
+        direction: Optional[Tuple[float, float]] = None,
+        spread: float = np.pi,
+        speed: Tuple[float, float] = (0.5, 3.0),
+        lifetime: Tuple[int, int] = (20, 60),
+        color: Tuple[int, int, int] = (255, 255, 255),
+    ) -> None:
+        """Creates particles at a point which fly off in random directions.
+
+        Args:
+            position (Tuple[float, float]): start point in pixels
+            count (int): number of particles; at most the capacity
+            velocity (Tuple[float, float], optional): common velocity in pixels per step, e.g. of the emitting sprite. Defaults to (0.0, 0.0).
+            direction (Tuple[float, float], optional): unit vector of the main direction; None = any direction. Defaults to None.
+            spread (float, optional): maximum deviation from the main direction in radiant. Defaults to np.pi.
+            speed (Tuple[float, float], optional): range of the own speed in pixels per step. Defaults to (0.5, 3.0).
+            lifetime (Tuple[int, int], optional): range of the lifetime in steps. Defaults to (20, 60).
+            color (Tuple[int, int, int], optional): color of a new particle. Defaults to (255, 255, 255).
+        """
+        count = min(count, self._capacity)
+        if count <= 0:
+            return
+        slots = (self._head + np.arange(count)) % self._capacity
+        self._head = (self._head + count) % self._capacity
+        angles = self._rng.uniform(-spread, spread, count)
+        if direction is not None:
+            angles += np.arctan2(direction[1], direction[0])
+        speeds = self._rng.uniform(speed[0], speed[1], count)
+        self._positions[0, slots] = position[0]
+        self._positions[1, slots] = position[1]
+        self._velocities[0, slots] = velocity[0] + speeds * np.cos(angles)
+        self._velocities[1, slots] = velocity[1] + speeds * np.sin(angles)
+        self._ages[slots] = 0
+        self._lifetimes[slots] = self._rng.integers(lifetime[0], lifetime[1], count, endpoint=True)
+        self._colors[slots] = self._color_index(color)
+        self._remaining = max(self._remaining, lifetime[1])
+
+    def _color_index(self, color: Tuple[int, int, int]) -> int:
+        """Index of a color in the palette; new colors are added."""
+        index = self._palette.get(color)
+        if index is None:
+            if len(self._palette) == 256:
+                raise ValueError("a particle system supports at most 256 colors")
+            index = self._palette[color] = len(self._palette)
+            self._shades = None
+        return index
+
+    def _map_shades(self, surface: pygame.surface.Surface) -> np.ndarray:
+        """All shades of the palette colors in the pixel format of a surface, from black to full brightness."""
+        pixel_format = (surface.get_shifts(), surface.get_losses())
+        if self._shades is None or self._format != pixel_format:
+            (red, green, blue, _), (red_loss, green_loss, blue_loss, _) = pixel_format
+            colors = np.array(list(self._palette), dtype=np.uint32).reshape(-1, 1, 3)
+            levels = np.arange(1, SHADES + 1, dtype=np.uint32).reshape(1, -1, 1)
+            shades = colors * levels // SHADES
+            self._shades = shades[..., 0] >> red_loss << red | shades[..., 1] >> green_loss << green | shades[..., 2] >> blue_loss << blue
+            self._format = pixel_format
+        return self._shades
+
+    def update(self) -> None:
+        """Moves all particles by one step, slows them down and lets them age."""
+        if self._remaining == 0:
+            return
+        self._remaining -= 1
+        positions, velocities = self._positions, self._velocities
+        positions += velocities
+        velocities *= self._drag
+        self._torus.wrap(positions[0], positions[1])
+        self._ages += 1
+
+    def draw(self, surface: pygame.surface.Surface, collect: bool = False) -> list[pygame.Rect]:
+        """Draws the live particles as pixels whose brightness fades with their age.
+
+        Args:
+            surface (pygame.surface.Surface): Target; a surface with 32 bits per pixel, e.g. the display.
+            collect (bool, optional): True = the covered cells are returned, e.g. for dirty rendering. Defaults to False.
+
+        Returns:
+            list[pygame.Rect]: cells of the surface containing particles; empty if collect is False
+        """
+        if self._remaining == 0:
+            return []
+        alive = np.flatnonzero(self._ages < self._lifetimes)
+        if len(alive) == 0:
+            return []
+        bounds = self._playground
+        x = np.clip(self._positions[0, alive].astype(np.intp), bounds.left, bounds.right - 1)  # float32 may round up to the edge
+        y = np.clip(self._positions[1, alive].astype(np.intp), bounds.top, bounds.bottom - 1)
+        levels = ((1 - self._ages[alive] / self._lifetimes[alive]) * SHADES).astype(np.intp)  # 0 ... SHADES - 1
+        mapped = self._map_shades(surface)[self._colors[alive], levels]
+        pixels = pygame.surfarray.pixels2d(surface)
+        pixels[x, y] = mapped
+        del pixels  # unlocks the surface
+        if not collect:
+            return []
+        size = self._cell_size
+        columns = -(-surface.get_width() // size)
+        occupied = np.zeros(columns * -(-surface.get_height() // size), dtype=bool)
+        occupied[y // size * columns + x // size] = True
+        cells = np.flatnonzero(occupied).tolist()
+        return [bounds.clip(pygame.Rect(cell % columns * size, cell // columns * size, size, size)) for cell in cells]
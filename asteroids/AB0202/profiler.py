@@ -0,0 +1,182 @@
+import gc
+import json
+import sys
+from contextlib import contextmanager
+from time import perf_counter_ns
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+import pygame
+
+
+class FrameProfiler:
+    """Collects timings of the phases of each frame and a few counters in a ring buffer.
+
+    Times are stored in milli seconds. The allocation counters are the change of the number of
+    allocated memory blocks and the number of garbage collections during the frame.
+    """
+
+    PHASES = ("events", "update", "draw")
+    COUNTERS = ("steps", "sprites", "blocks", "collections")
+    COLUMNS = ("frame",) + PHASES + COUNTERS
+
+    def __init__(self, capacity: int = 3600, enabled: bool = True) -> None:
+        """Constructor
+
+        Args:
+            capacity (int, optional): number of frames kept in the ring buffer. Defaults to 3600.
+            enabled (bool, optional): False = all measuring methods return immediately. Defaults to True.
+        """
+        self.enabled = enabled
+        self.overlay = False
+        self._data = np.zeros((capacity, len(FrameProfiler.COLUMNS)), dtype=np.float64)
+        self._current = np.zeros(len(FrameProfiler.COLUMNS), dtype=np.float64)
+        self._column = {name: index for index, name in enumerate(FrameProfiler.COLUMNS)}
+        self._frames = 0
+        self._frame_start = 0
+        self._blocks = 0
+        self._collections = 0
+        self._font: Optional[pygame.font.Font] = None
+
+    def __len__(self) -> int:
+        return min(self._frames, len(self._data))
+
+    @staticmethod
+    def _count_collections() -> int:
+        return sum(generation["collections"] for generation in gc.get_stats())
+
+    def begin_frame(self) -> None:
+        """Starts the measurement of a frame."""
+        if self.enabled:
+            self._current[:] = 0
+            self._blocks = sys.getallocatedblocks()
+            self._collections = FrameProfiler._count_collections()
+            self._frame_start = perf_counter_ns()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Measures the time of a phase; a phase may occur several times per frame.
+
+        Args:
+            name (str): one of FrameProfiler.PHASES
+        """
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._current[self._column[name]] += (perf_counter_ns() - start) / 1e6
+
+    def count(self, name: str, value: float) -> None:
+        """Sets a counter of the current frame.
+
+        Args:
+            name (str): one of FrameProfiler.COUNTERS
+            value (float): value of the counter
+        """
+        if self.enabled:
+            self._current[self._column[name]] = value
+
+    def end_frame(self) -> None:
+        """Finishes the measurement of a frame and stores it in the ring buffer."""
+        if self.enabled:
+            self._current[self._column["frame"]] = (perf_counter_ns() - self._frame_start) / 1e6
+            self._current[self._column["blocks"]] = sys.getallocatedblocks() - self._blocks
+            self._current[self._column["collections"]] = FrameProfiler._count_collections() - self._collections
+            self._data[self._frames % len(self._data)] = self._current
+            self._frames += 1
+
+    def frames(self) -> np.ndarray:
+        """All stored frames in chronological order.
+
+        Returns:
+            np.ndarray: one row per frame, one column per entry of FrameProfiler.COLUMNS
+        """
+        if self._frames <= len(self._data):
+            return self._data[: self._frames]
+        return np.roll(self._data, -(self._frames % len(self._data)), axis=0)
+
+    def percentiles(self, column: str = "frame", q: Sequence[float] = (50, 95, 99)) -> dict[str, float]:
+        """Percentiles of a column.
+
+        Args:
+            column (str, optional): name of the column. Defaults to "frame".
+            q (Sequence[float], optional): percentiles. Defaults to (50, 95, 99).
+
+        Returns:
+            dict[str, float]: e.g. {"p50": 1.2, "p95": 3.4, "p99": 5.6}
+        """
+        values = self.frames()[:, self._column[column]]
+        if len(values) == 0:
+            return {f"p{p:g}": 0.0 for p in q}
+        return {f"p{p:g}": float(value) for p, value in zip(q, np.percentile(values, q))}
+
+    def histogram(self, column: str = "frame", bins: int = 20) -> tuple[np.ndarray, np.ndarray]:
+        """Histogram of a column.
+
+        Args:
+            column (str, optional): name of the column. Defaults to "frame".
+            bins (int, optional): number of bins. Defaults to 20.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: counts and bin edges as returned by np.histogram
+        """
+        return np.histogram(self.frames()[:, self._column[column]], bins=bins)
+
+    def summary(self) -> str:
+        """Text report with the percentiles of all phases and a histogram of the frame times.
+
+        Returns:
+            str: multi-line report
+        """
+        lines = [f"{len(self)} frames"]
+        for column in ("frame",) + FrameProfiler.PHASES:
+            values = ", ".join(f"{key} {value:.3f}" for key, value in self.percentiles(column).items())
+            lines.append(f"{column:>8} ms: {values}")
+        counts, edges = self.histogram()
+        if counts.max(initial=0) > 0:
+            for count, low, high in zip(counts, edges, edges[1:]):
+                bar = "#" * int(round(40 * count / counts.max()))
+                lines.append(f"{low:7.3f}-{high:7.3f} ms {count:6d} {bar}")
+        return "\n".join(lines)
+
+    def export(self, filename: str) -> None:
+        """Writes all stored frames as CSV, or as JSON if the filename ends with ".json".
+
+        Args:
+            filename (str): Name of the file
+        """
+        frames = self.frames()
+        if filename.endswith(".json"):
+            report = {
+                "columns": list(FrameProfiler.COLUMNS),
+                "frames": frames.tolist(),
+                "percentiles": {column: self.percentiles(column) for column in ("frame",) + FrameProfiler.PHASES},
+            }
+            with open(filename, "w") as outfile:
+                json.dump(report, outfile, indent=1)
+        else:
+            np.savetxt(filename, frames, fmt="%.4f", delimiter=",", header=",".join(FrameProfiler.COLUMNS), comments="")
+
+    def draw_overlay(self, surface: pygame.surface.Surface, position: tuple[int, int]) -> pygame.Rect:
+        """Blits the values of the last frame and the percentiles of the frame time.
+
+        Args:
+            surface (pygame.surface.Surface): Target of the blit operation.
+            position (tuple[int, int]): left and top of the text
+
+        Returns:
+            pygame.Rect: area of the text on the surface
+        """
+        if self._font is None:
+            pygame.font.init()
+            self._font = pygame.font.Font(None, 20)
+        last = self._data[(self._frames - 1) % len(self._data)] if self._frames else self._current
+        percentiles = self.percentiles()
+        text = "  ".join(f"{name} {last[self._column[name]]:.2f}" for name in ("frame",) + FrameProfiler.PHASES)
+        text += "  " + "  ".join(f"{name} {int(last[self._column[name]])}" for name in FrameProfiler.COUNTERS)
+        text += "  " + "  ".join(f"{key} {value:.2f}" for key, value in percentiles.items())
+        image = self._font.render(text, True, (255, 255, 0))
+        return surface.blit(image, position)
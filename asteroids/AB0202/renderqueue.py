@@ -0,0 +1,98 @@
+from typing import Iterable, Optional
+
+import pygame
+
+
+class RenderQueue:
+    """Collects the blits of a frame and submits them in a single Surface.blits call.
+
+    Entries are bucketed by layer and by atlas (the surface the images are subsurfaces of),
+    so lower layers are drawn first and consecutive blits read from the same sprite sheet.
+    Bucketing instead of sorting keeps the cost linear in the number of entries. A layer can be
+    culled against a rect: entries outside are dropped before the blit.
+    """
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._buckets: dict[tuple[int, int], list[tuple[pygame.surface.Surface, pygame.Rect]]] = {}
+        self._cull: dict[int, pygame.Rect] = {}
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def set_cull(self, layer: int, rect: Optional[pygame.Rect]) -> None:
+        """Sets the visible area of a layer.
+
+        Args:
+            layer (int): the layer
+            rect (Optional[pygame.Rect]): entries not touching this rect are not drawn; None = no culling
+        """
+        if rect is None:
+            self._cull.pop(layer, None)
+        else:
+            self._cull[layer] = rect
+
+    @staticmethod
+    def _atlas(surface: pygame.surface.Surface) -> int:
+        """Key of the atlas of an image: its top-level parent surface."""
+        parent = surface.get_parent()
+        while parent is not None:
+            surface, parent = parent, parent.get_parent()
+        return id(surface)
+
+    def _bucket(self, layer: int, atlas: int) -> list[tuple[pygame.surface.Surface, pygame.Rect]]:
+        bucket = self._buckets.get((layer, atlas))
+        if bucket is None:
+            bucket = self._buckets[(layer, atlas)] = []
+        return bucket
+
+    def add(self, surface: pygame.surface.Surface, dest: pygame.Rect, layer: int = 0) -> None:
+        """Queues a single blit.
+
+        Args:
+            surface (pygame.surface.Surface): image
+            dest (pygame.Rect): target area; it is read when the queue is flushed
+            layer (int, optional): higher layers are drawn on top. Defaults to 0.
+        """
+        self._bucket(layer, RenderQueue._atlas(surface)).append((surface, dest))
+
+    def add_sprites(self, sprites: Iterable[pygame.sprite.Sprite], layer: int = 0) -> None:
+        """Queues image and rect of sprites whose images come from the same atlas.
+
+        Args:
+            sprites (Iterable[pygame.sprite.Sprite]): sprites with image and rect, e.g. a group
+            layer (int, optional): higher layers are drawn on top. Defaults to 0.
+        """
+        entries = [(sprite.image, sprite.rect) for sprite in sprites]
+        if entries:
+            self._bucket(layer, RenderQueue._atlas(entries[0][0])).extend(entries)
+
+    def clear(self) -> None:
+        """Drops all queued blits."""
+        self._buckets.clear()
+
+    def flush(self, target: pygame.surface.Surface, collect: bool = False) -> list[pygame.Rect]:
+        """Culls and draws all queued blits in layer order and empties the queue.
+
+        Args:
+            target (pygame.surface.Surface): Target of the blit operation.
+            collect (bool, optional): True = the drawn areas are returned, e.g. for dirty rendering. Defaults to False.
+
+        Returns:
+            list[pygame.Rect]: drawn areas clipped to the target (copies); empty if collect is False
+        """
+        blits: list[tuple[pygame.surface.Surface, pygame.Rect]] = []
+        for layer, atlas in sorted(self._buckets):
+            bucket = self._buckets[(layer, atlas)]
+            cull = self._cull.get(layer)
+            if cull is not None:
+                visible = cull.collidelistall([dest for _, dest in bucket])
+                if len(visible) < len(bucket):
+                    bucket = [bucket[index] for index in visible]
+            blits.extend(bucket)
+        self._buckets.clear()
+        target.blits(blits, doreturn=False)
+        if not collect:
+            return []
+        bounds = target.get_rect()
+        return [bounds.clip(dest) for _, dest in blits]
@@ -0,0 +1,144 @@
+from math import floor
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+
+class Layout(NamedTuple):
+    """Placement of the logical frame in a window of a certain size."""
+
+    frame: pygame.Rect  # area of the window showing the scaled frame; the rest is a black border
+    scale: float  # window pixels per logical pixel
+    integer: bool  # True = scale is a whole number
+
+
+class RenderTarget:
+    """The game draws into a surface of fixed logical size, which is scaled to the window once per frame.
+
+    Everything is drawn in logical coordinates: the background, atlases and fonts are loaded
+    once for the logical resolution and are never rescaled when the window changes. The frame
+    keeps its aspect ratio; the remaining area of the window stays black.
+
+    There are three ways of presenting a frame:
+        scale 1: the logical surface is a subsurface of the window; nothing is copied.
+        integer scale: only the tiles touched by updated rects are enlarged, by nearest neighbour scaling.
+        any other scale: the whole frame is smoothly scaled.
+    The whole frame is too large to be scaled at 60 fps on a 4K display, so a whole factor is
+    preferred as long as the frame does not shrink much, e.g. 3 instead of 3.09 for 4K and 1
+    instead of 1.03 for 720p.
+
+    The layout of every window size is computed once and cached, so switching between
+    windowed and fullscreen mode does not compute it again.
+    """
+
+    TILE = 32  # edge length in logical pixels of the tiles in which updated rects are enlarged
+
+    def __init__(
+        self,
+        logical_size: Tuple[int, int],
+        window_size: Optional[Tuple[int, int]] = None,
+        flags: int = 0,
+        integer_coverage: float = 0.9,
+    ) -> None:
+        """Constructor; opens the window.
+
+        Args:
+            logical_size (Tuple[int, int]): width and height the game draws in
+            window_size (Tuple[int, int], optional): width and height of the window; None = logical size. Defaults to None.
+            flags (int, optional): flags of pygame.display.set_mode, e.g. pygame.RESIZABLE. Defaults to 0.
+            integer_coverage (float, optional): A whole scale factor is used if the frame keeps at least this share of its largest possible size; 0 = always. Defaults to 0.9.
+        """
+        self.logical_size = logical_size
+        self._flags = flags
+        self._integer_coverage = integer_coverage
+        self._layouts: dict[Tuple[int, int], Layout] = {}
+        self.window: pygame.surface.Surface
+        self.surface: pygame.surface.Surface  # the game draws here
+        self.layout: Layout
+        self._frame: pygame.surface.Surface  # area of the window showing the frame
+        self.resize(window_size if window_size is not None else logical_size)
+
+    def _layout(self, window_size: Tuple[int, int]) -> Layout:
+        """Computes or takes the cached placement of the frame in a window."""
+        layout = self._layouts.get(window_size)
+        if layout is None:
+            width, height = self.logical_size
+            scale = min(window_size[0] / width, window_size[1] / height)
+            if scale >= 1 and floor(scale) / scale >= self._integer_coverage:
+                scale = floor(scale)
+            size = (round(width * scale), round(height * scale))
+            frame = pygame.Rect(((window_size[0] - size[0]) // 2, (window_size[1] - size[1]) // 2), size)
+            layout = self._layouts[window_size] = Layout(frame, scale, isinstance(scale, int))
+        return layout
+
+    def resize(self, window_size: Tuple[int, int]) -> None:
+        """(Re)opens the window in a new size.
+
+        The surface may be replaced; the game has to take it again and redraw the whole frame.
+
+        Args:
+            window_size (Tuple[int, int]): width and height of the window
+        """
+        self.window = pygame.display.set_mode(window_size, self._flags)
+        self.layout = self._layout(self.window.get_size())
+        self.window.fill((0, 0, 0))
+        self._frame = self.window.subsurface(self.layout.frame)
+        self.surface = self._frame if self.layout.scale == 1 else pygame.Surface(self.logical_size).convert(self.window)
+
+    def present(self, rects: Optional[Sequence[pygame.Rect]] = None) -> None:
+        """Shows the frame in the window.
+
+        Args:
+            rects (Sequence[pygame.Rect], optional): changed areas in logical coordinates; None = the whole frame. Defaults to None.
+        """
+        layout = self.layout
+        if layout.scale != 1 and not layout.integer:
+            pygame.transform.smoothscale(self.surface, layout.frame.size, self._frame)
+            pygame.display.update(layout.frame)
+            return
+        if rects is None:
+            rects = [self.surface.get_rect()]
+        if layout.scale == 1:
+            pygame.display.update([rect.move(layout.frame.topleft) for rect in rects])
+            return
+        scale, updated = layout.scale, []
+        for rect in self._tiles(rects):
+            target = pygame.Rect(rect.x * scale, rect.y * scale, rect.width * scale, rect.height * scale)
+            pygame.transform.scale(self.surface.subsurface(rect), target.size, self._frame.subsurface(target))
+            updated.append(target.move(layout.frame.topleft))
+        pygame.display.update(updated)
+
+    def _tiles(self, rects: Sequence[pygame.Rect]) -> list[pygame.Rect]:
+        """Covers rects by runs of tiles of a coarse grid, so overlapping areas are scaled only once.
+
+        Args:
+            rects (Sequence[pygame.Rect]): changed areas in logical coordinates
+
+        Returns:
+            list[pygame.Rect]: horizontal runs of changed tiles, clipped to the logical surface
+        """
+        size, bounds = RenderTarget.TILE, self.surface.get_rect()
+        dirty = np.zeros((-(-bounds.height // size), -(-bounds.width // size)), dtype=bool)
+        for rect in rects:
+            rect = bounds.clip(rect)
+            if rect.width and rect.height:
+                dirty[rect.top // size : (rect.bottom - 1) // size + 1, rect.left // size : (rect.right - 1) // size + 1] = True
+        tiles = []
+        for row in np.flatnonzero(dirty.any(axis=1)).tolist():
+            edges = np.flatnonzero(np.diff(dirty[row], prepend=False, append=False)).tolist()
+            for first, last in zip(edges[::2], edges[1::2]):
+                tiles.append(bounds.clip(pygame.Rect(first * size, row * size, (last - first) * size, size)))
+        return tiles
+
+    def to_logical(self, position: Tuple[int, int]) -> Tuple[int, int]:
+        """Converts a position in the window, e.g. of the mouse, into logical coordinates.
+
+        Args:
+            position (Tuple[int, int]): position in window pixels
+
+        Returns:
+            Tuple[int, int]: position in logical pixels
+        """
+        frame = self.layout.frame
+        return (int((position[0] - frame.left) / self.layout.scale), int((position[1] - frame.top) / self.layout.scale))
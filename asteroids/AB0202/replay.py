@@ -0,0 +1,140 @@
+import struct
+from typing import Any, Iterator, Optional
+
+import pygame
+from pygame.constants import KEYDOWN, KEYUP, QUIT
+
+
+class InputLog:
+    """Compact binary log of the input events of a game session.
+
+    File layout (little endian):
+        header: magic, version, seed of the game, number of simulated steps
+        events: per event the step before which it is handled, event type, key
+    """
+
+    MAGIC = b"ASTR"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHqI")
+    EVENT = struct.Struct("<IHI")
+    RECORDED_TYPES = (KEYDOWN, KEYUP, QUIT)
+
+    def __init__(self, seed: int, frames: int = 0, events: Optional[list[tuple[int, int, int]]] = None) -> None:
+        """Constructor
+
+        Args:
+            seed (int): seed of the random number generator of the game
+            frames (int, optional): number of simulated steps of the session. Defaults to 0.
+            events (list[tuple[int, int, int]], optional): (step, event type, key) in chronological order. Defaults to None.
+        """
+        self.seed = seed
+        self.frames = frames
+        self.events: list[tuple[int, int, int]] = events if events is not None else []
+
+    def record(self, frame: int, event: pygame.event.Event) -> None:
+        """Appends an event; events of other types than KEYDOWN, KEYUP and QUIT are ignored.
+
+        Args:
+            frame (int): number of steps simulated before the event is handled
+            event (pygame.event.Event): the event
+        """
+        if event.type in InputLog.RECORDED_TYPES:
+            self.events.append((frame, event.type, getattr(event, "key", 0)))
+        self.frames = max(self.frames, frame)
+
+    def to_bytes(self) -> bytes:
+        """Serializes the log.
+
+        Returns:
+            bytes: binary representation
+        """
+        header = InputLog.HEADER.pack(InputLog.MAGIC, InputLog.VERSION, self.seed, self.frames)
+        return header + b"".join(InputLog.EVENT.pack(*event) for event in self.events)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "InputLog":
+        """Deserializes a log.
+
+        Args:
+            data (bytes): binary representation
+
+        Raises:
+            ValueError: if data is not an input log of this version
+
+        Returns:
+            InputLog: the log
+        """
+        if len(data) < cls.HEADER.size:
+            raise ValueError("input log is too short")
+        magic, version, seed, frames = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("not an input log of version {}".format(cls.VERSION))
+        if (len(data) - cls.HEADER.size) % cls.EVENT.size:
+            raise ValueError("input log is truncated")
+        return cls(seed, frames, list(cls.EVENT.iter_unpack(data[cls.HEADER.size :])))
+
+    def save(self, filename: str) -> None:
+        """Writes the log into a file.
+
+        Args:
+            filename (str): Name of the file
+        """
+        with open(filename, "wb") as outfile:
+            outfile.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename: str) -> "InputLog":
+        """Reads a log from a file.
+
+        Args:
+            filename (str): Name of the file
+
+        Returns:
+            InputLog: the log
+        """
+        with open(filename, "rb") as infile:
+            return cls.from_bytes(infile.read())
+
+
+class ReplayPlayer:
+    """Re-simulates a recorded session as fast as possible."""
+
+    def __init__(self, log: InputLog) -> None:
+        """Constructor
+
+        Args:
+            log (InputLog): the recorded session
+        """
+        self._log = log
+
+    def events(self) -> Iterator[list[pygame.event.Event]]:
+        """Reconstructs the events of each step.
+
+        Yields:
+            list[pygame.event.Event]: events which are handled before the step
+        """
+        position = 0
+        for frame in range(self._log.frames):
+            events = []
+            while position < len(self._log.events) and self._log.events[position][0] <= frame:
+                _, eventtype, key = self._log.events[position]
+                events.append(pygame.event.Event(eventtype, key=key))
+                position += 1
+            yield events
+
+    def play(self, game: Any) -> int:
+        """Steps a game through the recorded session.
+
+        The game must be created with the seed of the log, e.g. Game(headless=True, seed=log.seed).
+
+        Args:
+            game (Game): fresh game
+
+        Returns:
+            int: number of simulated steps
+        """
+        frames = 0
+        for events in self.events():
+            game.step(events)
+            frames += 1
+        return frames
@@ -0,0 +1,98 @@
+from random import Random
+from typing import Optional, Tuple
+
+import numpy as np
+import pygame
+
+from torus import Torus
+
+
+class OccupancyGrid:
+    """Coarse grid of the playground for placing new sprites without overlaps.
+
+    A cell is occupied if a rect touches it or if it lies within the safe radius of a point,
+    e.g. the center of a ship. New sprites are put completely inside a free cell, which is
+    marked as occupied afterwards. Building the grid is O(n) in the number of rects and every
+    sample is O(1), so no spawn has to retry random positions.
+    """
+
+    def __init__(self, playground: pygame.Rect, cell_size: int = 64) -> None:
+        """Constructor
+
+        Args:
+            playground (pygame.Rect): Area which is covered by the grid; cells are wrapped around its edges.
+            cell_size (int, optional): Width and height of a cell in pixel; at least the size of the largest sprite to place. Defaults to 64.
+        """
+        self._playground = playground
+        self._torus = Torus(playground)
+        self._cell_size = cell_size
+        self._columns = max(1, playground.width // cell_size)  # only whole cells are used for placing
+        self._rows = max(1, playground.height // cell_size)
+        self._occupied = np.zeros((self._rows, self._columns), dtype=bool)
+        rows, columns = np.indices(self._occupied.shape)
+        self._cell_left = playground.left + columns * cell_size
+        self._cell_top = playground.top + rows * cell_size
+        self._free: Optional[list[int]] = None  # free cells in random order; None = not yet computed
+
+    def clear(self) -> None:
+        """Marks all cells as free."""
+        self._occupied[:] = False
+        self._free = None
+
+    def mark_rects(self, positions: np.ndarray, sizes: np.ndarray) -> None:
+        """Marks all cells touched by rects.
+
+        Args:
+            positions (np.ndarray): left and top of the rects in pixels; shape (n, 2)
+            sizes (np.ndarray): width and height of the rects in pixels; shape (n, 2)
+        """
+        if len(positions) == 0:
+            return
+        first = (np.asarray(positions) - self._playground.topleft) // self._cell_size
+        last = (np.asarray(positions) + np.asarray(sizes) - 1 - self._playground.topleft) // self._cell_size
+        span = int((last - first).max()) + 1
+        for row in range(span):
+            rows = np.minimum(first[:, 1] + row, last[:, 1]) % self._rows
+            for column in range(span):
+                columns = np.minimum(first[:, 0] + column, last[:, 0]) % self._columns
+                self._occupied[rows, columns] = True
+        self._free = None
+
+    def mark_circle(self, center: Tuple[int, int], radius: float) -> None:
+        """Marks all cells which come closer to a point than a radius; distances wrap around the edges.
+
+        Args:
+            center (Tuple[int, int]): the point, e.g. the center of a ship
+            radius (float): safe radius in pixels
+        """
+        dx, dy = self._torus.minimal(self._cell_left + self._cell_size / 2 - center[0], self._cell_top + self._cell_size / 2 - center[1])
+        nearest_x = np.maximum(np.abs(dx) - self._cell_size / 2, 0)  # distance to the nearest point of the cell
+        nearest_y = np.maximum(np.abs(dy) - self._cell_size / 2, 0)
+        self._occupied |= nearest_x**2 + nearest_y**2 < radius**2
+        self._free = None
+
+    def free_count(self) -> int:
+        """Number of free cells."""
+        return int(self._occupied.size - np.count_nonzero(self._occupied))
+
+    def sample(self, rng: Random, size: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """Takes a random free cell and a random position of a rect inside the cell.
+
+        Args:
+            rng (Random): random number generator
+            size (Tuple[int, int]): width and height of the rect; not larger than the cells
+
+        Returns:
+            Optional[Tuple[int, int]]: left and top of the rect; None if there is no free cell
+        """
+        if self._free is None:
+            self._free = np.flatnonzero(~self._occupied).tolist()
+            rng.shuffle(self._free)
+        if not self._free:
+            return None
+        cell = self._free.pop()
+        row, column = divmod(cell, self._columns)
+        self._occupied[row, column] = True
+        left = int(self._cell_left[row, column]) + rng.randint(0, max(0, self._cell_size - size[0]))
+        top = int(self._cell_top[row, column]) + rng.randint(0, max(0, self._cell_size - size[1]))
+        return left, top
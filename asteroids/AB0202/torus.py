@@ -0,0 +1,142 @@
+from typing import Any, Iterable, Tuple, TypeVar
+
+import numpy as np
+import pygame
+
+Coordinate = TypeVar("Coordinate", int, float, np.ndarray)
+
+
+class Torus:
+    """The playground as toroidal space: whatever leaves on one edge enters on the opposite edge.
+
+    Positions are wrapped continuously, so a sprite near an edge is partly outside of the
+    playground. Its ghosts are the copies shifted by the width and/or height of the playground;
+    they are drawn and tested for collisions like the sprite itself. Distances are measured as
+    minimal image, i.e. the shortest way around the torus.
+
+    All functions accept scalars as well as NumPy arrays; arrays are changed in place.
+    """
+
+    def __init__(self, playground: pygame.Rect, scale: int = 1) -> None:
+        """Constructor
+
+        Args:
+            playground (pygame.Rect): the wrapped area in pixels
+            scale (int, optional): units per pixel of the coordinates, e.g. fixedpoint.ONE for sub-pixels. Defaults to 1.
+        """
+        self.playground = playground
+        self.left = playground.left * scale
+        self.top = playground.top * scale
+        self.width = playground.width * scale
+        self.height = playground.height * scale
+
+    def wrap(self, x: Coordinate, y: Coordinate) -> Tuple[Coordinate, Coordinate]:
+        """Maps positions into the playground: left <= x < left + width, top <= y < top + height.
+
+        Args:
+            x (Coordinate): x coordinates; arrays are wrapped in place
+            y (Coordinate): y coordinates; arrays are wrapped in place
+
+        Returns:
+            Tuple[Coordinate, Coordinate]: wrapped coordinates
+        """
+        if isinstance(x, np.ndarray):
+            Torus._wrap_array(x, self.left, self.width)
+            Torus._wrap_array(y, self.top, self.height)
+            return x, y
+        return self.left + (x - self.left) % self.width, self.top + (y - self.top) % self.height
+
+    @staticmethod
+    def _wrap_array(values: np.ndarray, start: float, length: float) -> None:
+        if np.issubdtype(values.dtype, np.integer):
+            values -= start
+            np.remainder(values, length, out=values)
+            values += start
+        else:  # floor is several times faster than the modulo operator for floats
+            values -= length * np.floor((values - start) / length)
+
+    def minimal(self, dx: Coordinate, dy: Coordinate) -> Tuple[Coordinate, Coordinate]:
+        """Turns differences of positions into the shortest differences on the torus.
+
+        Args:
+            dx (Coordinate): differences in x direction; arrays are changed in place
+            dy (Coordinate): differences in y direction; arrays are changed in place
+
+        Returns:
+            Tuple[Coordinate, Coordinate]: differences with |dx| <= width / 2 and |dy| <= height / 2
+        """
+        if isinstance(dx, np.ndarray):
+            if np.issubdtype(dx.dtype, np.integer):
+                dx -= self.width * ((2 * dx + self.width) // (2 * self.width))
+                dy -= self.height * ((2 * dy + self.height) // (2 * self.height))
+            else:
+                dx -= self.width * np.rint(dx / self.width)
+                dy -= self.height * np.rint(dy / self.height)
+            return dx, dy
+        return dx - self.width * round(dx / self.width), dy - self.height * round(dy / self.height)
+
+    def distances(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Minimal image distances between two sets of positions.
+
+        Args:
+            a (np.ndarray): positions, shape (n, 2)
+            b (np.ndarray): positions, shape (m, 2)
+
+        Returns:
+            np.ndarray: distances, shape (n, m)
+        """
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        dx = a[:, 0, None] - b[None, :, 0]
+        dy = a[:, 1, None] - b[None, :, 1]
+        self.minimal(dx, dy)
+        return np.hypot(dx, dy)
+
+    def ghost_rects(self, rect: pygame.Rect) -> list[pygame.Rect]:
+        """Copies of a rect on the opposite edges; only for rects crossing an edge of the playground.
+
+        Args:
+            rect (pygame.Rect): rect in pixels
+
+        Returns:
+            list[pygame.Rect]: up to three ghosts; empty if the rect lies inside the playground
+        """
+        playground = self.playground
+        if playground.contains(rect):
+            return []
+        shifts_x = [0]
+        if rect.left < playground.left:
+            shifts_x.append(playground.width)
+        if rect.right > playground.right:
+            shifts_x.append(-playground.width)
+        shifts_y = [0]
+        if rect.top < playground.top:
+            shifts_y.append(playground.height)
+        if rect.bottom > playground.bottom:
+            shifts_y.append(-playground.height)
+        return [rect.move(shift_x, shift_y) for shift_x in shifts_x for shift_y in shifts_y if shift_x or shift_y]
+
+    def ghosts(self, sprites: Iterable[Any]) -> list[tuple[pygame.surface.Surface, pygame.Rect]]:
+        """Images and rects of the ghosts of all sprites crossing an edge, e.g. for a render queue.
+
+        Args:
+            sprites (Iterable[Any]): sprites with image and rect
+
+        Returns:
+            list[tuple[pygame.surface.Surface, pygame.Rect]]: blits of the ghosts
+        """
+        contains = self.playground.contains
+        return [(sprite.image, ghost) for sprite in sprites if not contains(sprite.rect) for ghost in self.ghost_rects(sprite.rect)]
+
+    def offset(self, a: Any, b: Any) -> Tuple[int, int]:
+        """Shortest offset from the rect of sprite a to the rect of sprite b."""
+        return self.minimal(b.rect.left - a.rect.left, b.rect.top - a.rect.top)
+
+    def collide_rect(self, a: Any, b: Any) -> bool:
+        """Rect collision test of two sprites across the edges; see pygame.sprite.collide_rect."""
+        dx, dy = self.offset(a, b)
+        return -b.rect.width < dx < a.rect.width and -b.rect.height < dy < a.rect.height
+
+    def collide_mask(self, a: Any, b: Any) -> bool:
+        """Pixel perfect collision test of two sprites across the edges; see pygame.sprite.collide_mask."""
+        return a.mask.overlap(b.mask, self.offset(a, b)) is not None
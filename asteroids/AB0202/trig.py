@@ -0,0 +1,70 @@
+from math import cos, radians, sin
+
+import numpy as np
+
+from fixedpoint import to_fixed
+
+
+class AngleTable:
+    """Precomputed sine and cosine of equally spaced angles.
+
+    The angles are addressed by an index: index i stands for i * 360 / steps degrees. Ships use
+    one entry per heading (= sprite frame), rocks one entry per degree. Besides the floats the
+    table offers the values as NumPy array for vectorized code and as scaled fixed-point vectors
+    for the physics; the fixed-point tables are built once per length.
+    """
+
+    def __init__(self, steps: int) -> None:
+        """Constructor
+
+        Args:
+            steps (int): number of angles in a full circle
+        """
+        self.steps = steps
+        self.step_angle = 360 / steps
+        self.vectors: tuple[tuple[float, float], ...] = tuple(
+            (sin(radians(index * self.step_angle)), cos(radians(index * self.step_angle))) for index in range(steps)
+        )
+        self.array = np.array(self.vectors, dtype=np.float64)  # shape (steps, 2): sine, cosine
+        self._fixed: dict[float, tuple[tuple[int, int], ...]] = {}
+
+    def __len__(self) -> int:
+        return self.steps
+
+    def index(self, angle: float) -> int:
+        """Index of the entry nearest to an angle.
+
+        Args:
+            angle (float): angle in degree
+
+        Returns:
+            int: index in 0 ... steps - 1
+        """
+        return round(angle / self.step_angle) % self.steps
+
+    def vector(self, index: int) -> tuple[float, float]:
+        """Sine and cosine of an angle.
+
+        Args:
+            index (int): index of the angle; taken modulo steps
+
+        Returns:
+            tuple[float, float]: sine and cosine
+        """
+        return self.vectors[index % self.steps]
+
+    def fixed(self, index: int, length: float = 1.0) -> tuple[int, int]:
+        """Sine and cosine of an angle multiplied by a length, as sub-pixel fixed-point integers.
+
+        Args:
+            index (int): index of the angle; taken modulo steps
+            length (float, optional): factor, e.g. a speed in pixels per step. Defaults to 1.0.
+
+        Returns:
+            tuple[int, int]: length * sine and length * cosine in sub-pixels
+        """
+        table = self._fixed.get(length)
+        if table is None:
+            table = tuple((to_fixed(length * x), to_fixed(length * y)) for x, y in self.vectors)
+            self._fixed[length] = table
+        return table[index % self.steps]